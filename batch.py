@@ -0,0 +1,299 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+
+from interpreterv3 import Interpreter
+from output import OutputSink
+
+
+class JobTimeout(BaseException):
+  # Raised in a worker when a job runs past its timeout, never caught as an error of the program
+  pass
+
+
+def load_manifest(path):
+  """Reads the jobs of a manifest, one JSON object per line
+
+  Each job names its "program" and may name an "input" file, an "expected"
+  output file and the "expected_error" type, such as "TYPE_ERROR", the
+  program must fail with. Relative paths are relative to the manifest.
+
+  Args:
+      path (string): Path of the manifest
+
+  Returns:
+      jobs ([dict]): The jobs, with absolute paths and a name
+  """
+  base = os.path.dirname(os.path.abspath(path))
+  jobs = []
+  with open(path) as handle:
+    for line in handle:
+      line = line.strip()
+      if (not line or line.startswith('#')):
+        continue
+      job = json.loads(line)
+      for key in ('program', 'input', 'expected'):
+        if (job.get(key) is not None):
+          job[key] = os.path.join(base, job[key])
+      job.setdefault('name', os.path.relpath(job['program'], base))
+      jobs.append(job)
+  return jobs
+
+
+def read_lines(path):
+  # Lines of a file without their line breaks, None without a file
+  if (path is None):
+    return None
+  with open(path) as handle:
+    return handle.read().splitlines()
+
+
+def on_timeout(signum, frame):
+  raise JobTimeout()
+
+
+def run_job(job, timeout=None):
+  """Runs a single job and compares its output with the expected one
+
+  Args:
+      job (dict): The job, as read by load_manifest
+      timeout (float): Seconds the job may run, None for no limit
+
+  Returns:
+      result (dict): Name, status, whether it passed, seconds, error and output size of the job
+  """
+  result = {'name': job['name'], 'program': job['program']}
+  start = time.perf_counter()
+  interpreter = None
+  error = None
+  status = None
+  # The alarm interrupts the interpreter loop, so the worker can go on with the next job
+  timed = timeout is not None and hasattr(signal, 'setitimer')
+  if (timed):
+    signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+  try:
+    try:
+      inputs = read_lines(job.get('input'))
+      # No input or an empty list would read stdin, an iterator runs out instead
+      interpreter = Interpreter(console_output=False, input=iter(inputs or ()), output_sink=OutputSink())
+      interpreter.run(job['program'])
+    finally:
+      if (timed):
+        signal.setitimer(signal.ITIMER_REAL, 0)
+  except JobTimeout:
+    # Also when the alarm goes off right as the job ends, it only goes off once
+    status = 'timeout'
+  except Exception as exception:
+    error = str(exception)
+  result['seconds'] = time.perf_counter() - start
+
+  output = interpreter.get_output() if interpreter is not None else []
+  expected = read_lines(job.get('expected'))
+  expected_error = job.get('expected_error')
+  if (status is None):
+    error_type = interpreter.error_type if interpreter is not None else None
+    if (error is not None and error_type is None):
+      # Not an error of the program but of the interpreter or the job
+      status = 'crash'
+    elif (expected_error is not None):
+      failed_as_expected = error_type is not None and error_type.name == expected_error
+      status = 'pass' if failed_as_expected and (expected is None or output == expected) else 'fail'
+    elif (error is not None):
+      status = 'error'
+    else:
+      status = 'pass' if expected is None or output == expected else 'fail'
+
+  result['status'] = status
+  result['passed'] = status == 'pass'
+  result['error'] = error
+  result['output_lines'] = len(output)
+  if (status == 'fail' and expected is not None):
+    # First line the output differs on, the length of the shorter one if one is a prefix of the other
+    result['first_difference'] = next((index for index, (line, wanted) in enumerate(zip(output, expected))
+                                       if line != wanted), min(len(output), len(expected)))
+  return result
+
+
+def run_indexed(arguments):
+  # Results carry the index of their job
+  index, job, timeout = arguments
+  result = run_job(job, timeout)
+  result['index'] = index
+  return result
+
+
+# Progress of each chunk of the pool a worker belongs to, 1 once started and 2 once done
+progress = None
+
+
+def start_worker(shared_progress):
+  global progress
+  progress = shared_progress
+
+
+def run_chunk(number, chunk):
+  # Workers take chunks of tasks, so short jobs share the cost of their dispatch
+  progress[number] = 1
+  results = [run_indexed(task) for task in chunk]
+  progress[number] = 2
+  return results
+
+
+def lost_result(task):
+  """Gives the result of a job whose worker died while running it
+
+  Args:
+      task (tuple): Index, job and timeout of the job
+
+  Returns:
+      result (dict): The job reported as a crash
+  """
+  index, job, timeout = task
+  return {'name': job['name'], 'program': job['program'], 'seconds': None, 'status': 'crash',
+          'passed': False, 'error': 'worker process died', 'output_lines': 0, 'index': index}
+
+
+def run_pool(chunks, workers, context, lost, suspects):
+  """Runs chunks of tasks in a pool, yielding results until they are all done or the pool breaks
+
+  A worker dying breaks the pool and every chunk not done yet is lost.
+  Chunks a worker had started are suspects, the others never ran.
+
+  Args:
+      chunks ([[tuple]]): Chunks of index, job and timeout of each task
+      workers (int): Number of processes
+      context: Multiprocessing context the workers are started from
+      lost ([[tuple]]): Gets the chunks that never ran, or ran without their results arriving
+      suspects ([[tuple]]): Gets the chunks running when the pool broke
+
+  Returns:
+      results: Generator of job results
+  """
+  shared_progress = context.Array('b', len(chunks), lock=False)
+  # Chunks are submitted in waves a few per worker, so a pool breaking early leaves the rest unsubmitted
+  waiting = iter(range(len(chunks)))
+  with ProcessPoolExecutor(workers, mp_context=context, initializer=start_worker, initargs=(shared_progress,)) as pool:
+    futures = {}
+    delivered = set()
+    broken = False
+    try:
+      for number in waiting:
+        futures[pool.submit(run_chunk, number, chunks[number])] = number
+        if (len(futures) == 2 * workers):
+          break
+    except BrokenProcessPool:
+      broken = True
+    while (futures):
+      done, _ = wait(futures, return_when=FIRST_COMPLETED)
+      for future in done:
+        number = futures.pop(future)
+        try:
+          results = future.result()
+        except BrokenProcessPool:
+          broken = True
+          continue
+        delivered.add(number)
+        for result in results:
+          yield result
+        if (not broken):
+          try:
+            for number in waiting:
+              futures[pool.submit(run_chunk, number, chunks[number])] = number
+              break
+          except BrokenProcessPool:
+            broken = True
+  if (broken):
+    for number, chunk in enumerate(chunks):
+      if (number in delivered):
+        continue
+      if (shared_progress[number] == 1):
+        suspects.append(chunk)
+      else:
+        # Chunks done whose results were lost with the pool did not kill their worker
+        lost.append(chunk)
+
+
+def run_batch(jobs, workers=None, timeout=None, chunk_size=1):
+  """Runs jobs across a pool of processes, yielding each result as soon as it is ready
+
+  Every worker imports the interpreter once and runs many jobs, so the
+  pool scales with the number of cores once jobs outweigh their dispatch.
+  A worker dying, killed or crashed, breaks the pool. The chunks that
+  never ran go on in a new pool of the same size. The jobs of chunks
+  running at the time each run alone in a single-worker pool, so the
+  ones that kill their worker again are reported as crashes.
+
+  Args:
+      jobs ([dict]): The jobs, as read by load_manifest
+      workers (int): Number of processes, the number of cores by default, 0 runs in this process
+      timeout (float): Seconds each job may run, None for no limit
+      chunk_size (int): Jobs handed to a worker at a time, more amortizes dispatch for short jobs
+
+  Returns:
+      results: Generator of job results, in the order they finish, each with the index of its job
+  """
+  tasks = [(index, job, timeout) for index, job in enumerate(jobs)]
+  if (workers == 0):
+    for task in tasks:
+      yield run_indexed(task)
+    return
+  if (workers is None):
+    workers = os.cpu_count() or 1
+  # Forked workers start with the interpreter already imported
+  methods = multiprocessing.get_all_start_methods()
+  context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+  chunks = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+  while (chunks):
+    lost = []
+    suspects = []
+    yield from run_pool(chunks, workers, context, lost, suspects)
+    if (lost and not suspects):
+      # Workers died before starting any chunk, blaming the first keeps every round going forward
+      suspects.append(lost.pop(0))
+    for chunk in suspects:
+      for task in chunk:
+        failed = []
+        yield from run_pool([[task]], 1, context, failed, failed)
+        if (failed):
+          yield lost_result(task)
+    chunks = lost
+
+
+def main():
+  import argparse
+
+  parser = argparse.ArgumentParser(description='Runs the Brewin programs of a manifest across a process pool, '
+                                               'writing a JSON line per job')
+  parser.add_argument('manifest', help='JSON lines file with the program, input, expected and expected_error of each job')
+  parser.add_argument('--workers', type=int, default=None, help='number of processes, the number of cores by default')
+  parser.add_argument('--timeout', type=float, default=None, help='seconds each job may run')
+  parser.add_argument('--chunk-size', type=int, default=1, help='jobs handed to a worker at a time')
+  parser.add_argument('--output', help='file to write the results to, stdout by default')
+  arguments = parser.parse_args()
+
+  jobs = load_manifest(arguments.manifest)
+  stream = open(arguments.output, 'w') if arguments.output else sys.stdout
+  counts = {}
+  start = time.perf_counter()
+  try:
+    for result in run_batch(jobs, arguments.workers, arguments.timeout, arguments.chunk_size):
+      counts[result['status']] = counts.get(result['status'], 0) + 1
+      stream.write(json.dumps(result) + '\n')
+      stream.flush()
+  finally:
+    if (stream is not sys.stdout):
+      stream.close()
+  elapsed = time.perf_counter() - start
+  summary = ', '.join(f'{count} {status}' for status, count in sorted(counts.items()))
+  print(f'{len(jobs)} jobs in {elapsed:.2f}s: {summary}', file=sys.stderr)
+  sys.exit(0 if counts.get('pass', 0) == len(jobs) else 1)
+
+
+if __name__ == '__main__':
+  main()
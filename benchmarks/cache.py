@@ -0,0 +1,55 @@
+import shutil
+import tempfile
+import time
+
+from common import timed
+from program import Program
+from suite import frontend_program
+
+
+def load(program, cache_dir):
+  """Gets a program ready to run, timing its front end
+
+  Args:
+      program ([string]): The program
+      cache_dir (string): Cache directory, None to run without a cache
+
+  Returns:
+      seconds (float): Time spent before compiling to instructions
+  """
+  compiled = Program(cache_dir=cache_dir)
+  lower = compiled.compiler.lower
+  compile_time = []
+  def timed_lower(*args):
+    start = time.perf_counter()
+    instructions = lower(*args)
+    compile_time.append(time.perf_counter() - start)
+    return instructions
+  compiled.compiler.lower = timed_lower
+  compiled.load(program)
+  return compile_time[0]
+
+
+def timed_load(program, cache_dir):
+  # Total and front end seconds of loading the program
+  total, compile_time = timed(load, program, cache_dir)
+  return total, total - compile_time
+
+
+def main():
+  program = frontend_program(100000)
+  cache_dir = tempfile.mkdtemp()
+  try:
+    timings = [('no cache', timed_load(program, None)), ('cold start', timed_load(program, cache_dir))]
+    timings.append(('warm start', min(timed_load(program, cache_dir) for _ in range(3))))
+  finally:
+    shutil.rmtree(cache_dir)
+
+  print(f'lines: {len(program)}')
+  print('              total  front end')
+  for name, (total, front_end) in timings:
+    print(f'{name:10}  {total:7.3f}s  {front_end:8.3f}s')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,60 @@
+import gc
+import os
+import sys
+import time
+
+# Benchmarks import the interpreter from the top of the repository
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+if (ROOT not in sys.path):
+  sys.path.insert(0, ROOT)
+
+
+def timed(function, *args):
+  """Times a call, starting from a clean heap so it does not pay for earlier ones
+
+  Args:
+      function (function): The function called
+      args: Its arguments
+
+  Returns:
+      (float, result): Wall time of the call, and what it returned
+  """
+  gc.collect()
+  start = time.perf_counter()
+  result = function(*args)
+  return time.perf_counter() - start, result
+
+
+def best_time(function, *args, repeat=5):
+  """Times the fastest of a few calls
+
+  Args:
+      function (function): The function called
+      args: Its arguments
+      repeat (int): Number of calls
+
+  Returns:
+      seconds (float): Wall time of the fastest call
+  """
+  return min(timed(function, *args)[0] for _ in range(repeat))
+
+
+def peak_memory(function, *args):
+  """Measures the most memory allocated at once during a call
+
+  Args:
+      function (function): The function called
+      args: Its arguments
+
+  Returns:
+      bytes (int): Peak size of the Python allocations
+  """
+  # Imports linecache and with it the standard tokenize, so it is only imported once the interpreter is
+  import tracemalloc
+  gc.collect()
+  tracemalloc.start()
+  try:
+    function(*args)
+    return tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
@@ -0,0 +1,23 @@
+from common import timed
+from interpreterv3 import Interpreter
+from suite import frontend_program
+from tokenize import Tokenizer
+
+
+def tokenize_all(program):
+  tokenizer = Tokenizer()
+  for line in program:
+    tokenizer.tokenize(line.strip())
+
+
+def main():
+  program = frontend_program(100000)
+  tokenize_time, _ = timed(tokenize_all, program)
+  run_time, _ = timed(Interpreter(console_output=False).run, program)
+  print(f'lines: {len(program)}')
+  print(f'tokenize: {tokenize_time:.3f}s ({len(program) / tokenize_time:,.0f} lines/s)')
+  print(f'load and run: {run_time:.3f}s')
+
+
+if __name__ == '__main__':
+  main()
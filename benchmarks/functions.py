@@ -0,0 +1,16 @@
+from common import timed
+from interpreterv3 import Interpreter
+from suite import functions_program
+
+
+def main():
+  # Finding functions by name or line costs the same however many the program has
+  print('functions  lines  seconds  microseconds/function')
+  for function_count in (1000, 10000, 20000):
+    program = functions_program(function_count)
+    elapsed, _ = timed(Interpreter(console_output=False).run, program)
+    print(f'{function_count:9}  {len(program):5}  {elapsed:7.3f}  {elapsed / function_count * 1e6:8.2f}')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,44 @@
+import os
+import tempfile
+
+from common import timed
+from interpreterv3 import Interpreter
+from output import OutputSink
+from suite import summing_program
+
+
+def load_list(path):
+  # How input used to be given, every line read into a list up front
+  with open(path) as handle:
+    return [line.rstrip('\n') for line in handle]
+
+
+def run(program, source):
+  # Prompts are not kept, only input is measured
+  interpreter = Interpreter(console_output=False, input=source(), output_sink=OutputSink(retain=1))
+  interpreter.run(program)
+  return interpreter.get_output()[-1]
+
+
+def main():
+  line_count = 300000
+  program = summing_program(line_count)
+  with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as handle:
+    handle.write(''.join(f'{index}\n' for index in range(line_count)))
+  try:
+    sources = [
+      ('list loaded up front', lambda: load_list(handle.name)),
+      ('text file object', lambda: open(handle.name)),
+      ('binary file object', lambda: open(handle.name, 'rb')),
+      ('generator', lambda: (str(index) for index in range(line_count))),
+    ]
+    print(f'lines read: {line_count}')
+    for name, source in sources:
+      elapsed, total = timed(run, program, source)
+      print(f'{name:22}  {elapsed:6.3f}s  {line_count / elapsed:9,.0f} lines/s  sum {total}')
+  finally:
+    os.unlink(handle.name)
+
+
+if __name__ == '__main__':
+  main()
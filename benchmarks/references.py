@@ -0,0 +1,23 @@
+from common import timed
+from interpreterv3 import Interpreter
+from suite import reference_program
+
+
+def run(program):
+  interpreter = Interpreter(console_output=False)
+  interpreter.run(program)
+  return interpreter.get_output()
+
+
+def main():
+  # Assigning through a reference costs the same whatever the size of the frame holding it
+  iterations = 20000
+  print('locals  seconds  microseconds/iteration')
+  for frame_size in (0, 10, 100, 1000):
+    elapsed, output = timed(run, reference_program(frame_size, iterations))
+    assert output == [str(iterations)]
+    print(f'{frame_size:6}  {elapsed:7.3f}  {elapsed / iterations * 1e6:8.2f}')
+
+
+if __name__ == '__main__':
+  main()
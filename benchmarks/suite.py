@@ -0,0 +1,505 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+from common import ROOT, peak_memory, timed
+from interpreterv3 import Interpreter
+from output import OutputSink
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'programs')
+
+
+# Builders of the generated programs of the corpus, sized by their argument
+
+def counting_program(iterations, declares=False):
+  """Builds a program counting in a loop, with an if in the loop body
+
+  Args:
+      iterations (int): Number of iterations of the loop
+      declares (bool): Whether the loop body declares a variable
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func main void',
+    '  var int i evens',
+    f'  while < i {iterations}',
+    '    var int unused' if declares else '',
+    '    if == % i 2 0',
+    '      assign evens + evens 1',
+    '    endif',
+    '    assign i + i 1',
+    '  endwhile',
+    '  funccall print evens',
+    'endfunc',
+  ]
+
+
+def fused_program(iterations):
+  """Builds a program whose loop increments, branches on a bool and stores results
+
+  Args:
+      iterations (int): Number of iterations of the loop
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func half n:int int',
+    '  return / n 2',
+    'endfunc',
+    'func main void',
+    '  var int i total h',
+    '  var bool going odd',
+    '  assign going True',
+    '  while going',
+    '    assign i + i 1',
+    '    funccall half i',
+    '    assign h resulti',
+    '    assign odd != * h 2 i',
+    '    if odd',
+    '      assign total + total 1',
+    '    endif',
+    '    funccall strtoint "1"',
+    '    assign h resulti',
+    f'    assign going < i {iterations}',
+    '  endwhile',
+    '  funccall print total',
+    'endfunc',
+  ]
+
+
+def arithmetic_program(iterations):
+  """Builds a program whose loop evaluates expressions over declared variables
+
+  Args:
+      iterations (int): Number of iterations of the loop
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func main void',
+    '  var int i total square',
+    '  var string text',
+    f'  while < i {iterations}',
+    '    assign square * i i',
+    '    assign total + total % square 7',
+    '    if == % i 1000 0',
+    '      assign text + text "."',
+    '    endif',
+    '    assign i + i 1',
+    '  endwhile',
+    '  funccall print total " " text',
+    'endfunc',
+  ]
+
+
+def fib_program(n):
+  """Builds a program computing the nth Fibonacci number with naive recursion
+
+  Args:
+      n (int): Index of the Fibonacci number
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func fib n:int int',
+    '  if < n 2',
+    '    return n',
+    '  endif',
+    '  var int m a',
+    '  assign m - n 1',
+    '  funccall fib m',
+    '  assign a resulti',
+    '  assign m - n 2',
+    '  funccall fib m',
+    '  return + a resulti',
+    'endfunc',
+    'func main void',
+    f'  funccall fib {n}',
+    '  funccall print resulti',
+    'endfunc',
+  ]
+
+
+def accumulator_program(depth, tail=True):
+  """Builds a program summing 1 to depth with a recursive accumulator
+
+  Args:
+      depth (int): Depth of the recursion
+      tail (bool): Whether the recursive call is in tail position
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func count n:int acc:int int',
+    '  if == n 0',
+    '    return acc',
+    '  endif',
+    '  var int m a',
+    '  assign m - n 1',
+    '  assign a + acc n',
+    '  funccall count m a',
+    # Adding 0 keeps the result the same, but the call is no longer the last thing done
+    '  return resulti' if tail else '  return + resulti 0',
+    'endfunc',
+    'func main void',
+    f'  funccall count {depth} 0',
+    '  funccall print resulti',
+    'endfunc',
+  ]
+
+
+def reference_program(frame_size, iterations):
+  """Builds a program assigning to a refint parameter in a function with many locals
+
+  Args:
+      frame_size (int): Number of extra locals declared by the function
+      iterations (int): Number of assignments to the reference parameter
+
+  Returns:
+      program ([string]): The program
+  """
+  program = ['func bump x:refint void']
+  for index in range(frame_size):
+    program.append(f'  var int local{index}')
+  program += [
+    '  var int i',
+    f'  while < i {iterations}',
+    '    assign x + x 1',
+    '    assign i + i 1',
+    '  endwhile',
+    'endfunc',
+    '',
+    'func main void',
+    '  var int total',
+    '  funccall bump total',
+    '  funccall print total',
+    'endfunc',
+  ]
+  return program
+
+
+def functions_program(function_count):
+  """Builds a program with many functions, each creating and calling a lambda
+
+  Args:
+      function_count (int): Number of functions besides main
+
+  Returns:
+      program ([string]): The program
+  """
+  program = []
+  for index in range(function_count):
+    program += [
+      f'func f{index} x:int int',
+      '  lambda y:int int',
+      f'    return + y {index}',
+      '  endlambda',
+      '  funccall resultf x',
+      '  return resulti',
+      'endfunc',
+    ]
+  program += ['func main void', '  var int total']
+  # Call a spread of the functions, so lookups hit all over the tables
+  for index in range(0, function_count, max(1, function_count // 100)):
+    program += [f'  funccall f{index} 1', '  assign total + total resulti']
+  program += ['  funccall print total', 'endfunc']
+  return program
+
+
+def frontend_program(line_count):
+  """Builds a program of about line_count lines mixing the statements of typical programs
+
+  Args:
+      line_count (int): Number of lines to generate, at least
+
+  Returns:
+      program ([string]): The program
+  """
+  program = []
+  index = 0
+  while (len(program) < line_count):
+    program += [
+      f'# function number {index}',
+      f'func f{index} count:int label:string string',
+      '  var int i',
+      '  var string text   # built up in the loop',
+      '  while < i count',
+      '    if == % i 2 0',
+      '      assign text + text "even # not a comment"',
+      '    else',
+      f'      assign text + text label',
+      '    endif',
+      '    assign i + i 1',
+      '  endwhile',
+      '  return text',
+      'endfunc',
+      '',
+    ]
+    index += 1
+  program += ['func main void', '  funccall f0 3 "x"', '  funccall print results', 'endfunc']
+  return program
+
+
+def sparse_program(function_count, called):
+  """Builds a program with many functions, of which main calls only some
+
+  Args:
+      function_count (int): Number of functions besides main
+      called (float): Fraction of the functions main calls
+
+  Returns:
+      program ([string]): The program
+  """
+  program = []
+  for index in range(function_count):
+    program += [
+      f'func f{index} count:int int',
+      '  var int i total',
+      '  while < i count',
+      '    if == % i 2 0',
+      '      assign total + total i',
+      '    endif',
+      '    assign i + i 1',
+      '  endwhile',
+      '  return total',
+      'endfunc',
+    ]
+  program += ['func main void']
+  step = max(1, round(1 / called))
+  for index in range(0, function_count, step):
+    program += [f'  funccall f{index} 3']
+  program += ['endfunc']
+  return program
+
+
+def summing_program(line_count):
+  """Builds a program reading line_count numbers with input and printing their sum
+
+  Args:
+      line_count (int): Number of lines read
+
+  Returns:
+      program ([string]): The program
+  """
+  return [
+    'func main void',
+    '  var int i total',
+    f'  while < i {line_count}',
+    '    funccall input',
+    '    funccall strtoint results',
+    '    assign total + total resulti',
+    '    assign i + i 1',
+    '  endwhile',
+    '  funccall print total',
+    'endfunc',
+  ]
+
+
+def corpus(scale=1.0):
+  """Gives the programs of the corpus, the files under programs/ and the generated ones
+
+  Args:
+      scale (float): Factor the size of the generated programs is multiplied by
+
+  Returns:
+      programs (dict): Path or lines of each program and the input it reads, by name
+  """
+  def size(count):
+    return max(1, round(count * scale))
+  programs = {}
+  for path in sorted(glob.glob(os.path.join(PROGRAMS, '*.src'))):
+    programs[os.path.basename(path)[:-4]] = (path, None)
+  numbers = [str(index) for index in range(size(30000))]
+  programs.update({
+    'blocks': (counting_program(size(60000)), None),
+    'fusion': (fused_program(size(15000)), None),
+    'arithmetic': (arithmetic_program(size(40000)), None),
+    # Naive recursion makes about 1.6^n calls
+    'fib': (fib_program(max(2, 20 + round(math.log(scale, 1.6)))), None),
+    'tailcalls': (accumulator_program(size(40000)), None),
+    'deep_frames': (reference_program(size(1000), size(60000)), None),
+    'functions': (functions_program(size(2000)), None),
+    'frontend': (frontend_program(size(20000)), None),
+    'sparse': (sparse_program(size(1000), 0.1), None),
+    'input': (summing_program(len(numbers)), numbers),
+  })
+  return programs
+
+
+def new_interpreter(input, options):
+  # Output is retained but never written, so the suite measures the interpreter only
+  return Interpreter(console_output=False, input=input, output_sink=OutputSink(), **options)
+
+
+def count_statements(program, input, options):
+  """Runs a program once, counting the statements it executes
+
+  Args:
+      program: Path or lines of the program
+      input ([string]): Its input lines, None when it reads none
+      options (dict): Options of the interpreter
+
+  Returns:
+      (int, [string]): Number of statements executed, and the output
+  """
+  # Superinstructions run several statements at once, so statements are counted without them
+  interpreter = new_interpreter(input, dict(options, fuse=False))
+  count = [0]
+  def counting(handler):
+    def handle(instruction):
+      count[0] += 1
+      return handler(instruction)
+    return handle
+  interpreter.handlers = [handler if handler is None else counting(handler) for handler in interpreter.handlers]
+  interpreter.run(program)
+  return count[0], interpreter.get_output()
+
+
+def run(program, input, options):
+  # A run from loading the program to the end of main
+  new_interpreter(input, options).run(program)
+
+
+def benchmark(program, input, options, warmup, repeat):
+  """Benchmarks a program
+
+  Args:
+      program: Path or lines of the program
+      input ([string]): Its input lines, None when it reads none
+      options (dict): Options of the interpreter
+      warmup (int): Untimed runs before timing
+      repeat (int): Timed runs
+
+  Returns:
+      result (dict): Statements executed, wall times, statements per second, peak memory and output digest
+  """
+  statements, output = count_statements(program, input, options)
+  for _ in range(warmup):
+    run(program, input, options)
+  times = [timed(run, program, input, options)[0] for _ in range(repeat)]
+  median = statistics.median(times)
+  return {
+    'statements': statements,
+    'wall_time': {'min': min(times), 'median': median, 'max': max(times), 'runs': times},
+    'statements_per_second': statements / median,
+    'peak_memory_bytes': peak_memory(run, program, input, options),
+    'output_lines': len(output),
+    'output_sha256': hashlib.sha256('\n'.join(output).encode()).hexdigest(),
+  }
+
+
+def revision():
+  # Commit being measured, None outside a git checkout
+  try:
+    result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+  except OSError:
+    return None
+  return result.stdout.strip() or None
+
+
+def parse_option(text):
+  """Reads an interpreter option given as name=value
+
+  Args:
+      text (string): The option, its value written as JSON, such as fuse=false or cache_dir="/tmp/cache"
+
+  Returns:
+      (string, value): Name and value of the option
+  """
+  name, _, value = text.partition('=')
+  try:
+    return name, json.loads(value)
+  except ValueError:
+    # Bare words are strings
+    return name, value
+
+
+def compare(baseline, report):
+  """Prints how each benchmark changed against an earlier report
+
+  Args:
+      baseline (dict): Earlier report
+      report (dict): Current report
+  """
+  print('benchmark     statements/s   change   peak memory   change   output')
+  for name, result in report['benchmarks'].items():
+    before = baseline['benchmarks'].get(name)
+    if (before is None):
+      print(f'{name:12}  {result["statements_per_second"]:12,.0f}   (new)')
+      continue
+    speed = result['statements_per_second'] / before['statements_per_second'] - 1
+    memory = result['peak_memory_bytes'] / before['peak_memory_bytes'] - 1
+    same = 'same' if result['output_sha256'] == before['output_sha256'] else 'DIFFERENT'
+    print(f'{name:12}  {result["statements_per_second"]:12,.0f}  {speed:+7.1%}  '
+          f'{result["peak_memory_bytes"] / 2**20:9.1f} MiB  {memory:+7.1%}   {same}')
+
+
+def main(argv=None):
+  """Runs the benchmarks and writes their report
+
+  Args:
+      argv ([string]): Command line arguments, those of the process by default
+
+  Returns:
+      report (dict): The report written
+  """
+  parser = argparse.ArgumentParser(description='Runs the benchmark programs and reports their timings as JSON')
+  parser.add_argument('names', nargs='*', help='benchmarks to run, all of them by default')
+  parser.add_argument('--warmup', type=int, default=1, help='untimed runs before timing')
+  parser.add_argument('--repeat', type=int, default=5, help='timed runs')
+  parser.add_argument('--scale', type=float, default=1.0, help='factor the size of the generated programs is multiplied by')
+  parser.add_argument('--option', action='append', default=[], type=parse_option, metavar='NAME=VALUE',
+                      help='interpreter option, such as fuse=false or memoize=true, repeatable')
+  parser.add_argument('--output', help='file to write the JSON report to, stdout by default')
+  parser.add_argument('--compare', help='earlier JSON report to compare with, such as one run with other options')
+  arguments = parser.parse_args(argv)
+
+  programs = corpus(arguments.scale)
+  if (arguments.names):
+    programs = {name: programs[name] for name in arguments.names}
+  options = dict(arguments.option)
+
+  report = {
+    'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    'revision': revision(),
+    'python': sys.version,
+    'platform': platform.platform(),
+    'warmup': arguments.warmup,
+    'repeat': arguments.repeat,
+    'scale': arguments.scale,
+    'options': options,
+    'benchmarks': {},
+  }
+  for name, (program, input) in programs.items():
+    report['benchmarks'][name] = benchmark(program, input, options, arguments.warmup, arguments.repeat)
+    print(f'{name}: {report["benchmarks"][name]["statements_per_second"]:,.0f} statements/s', file=sys.stderr)
+
+  text = json.dumps(report, indent=2)
+  if (arguments.output):
+    with open(arguments.output, 'w') as handle:
+      handle.write(text + '\n')
+  else:
+    print(text)
+
+  if (arguments.compare):
+    with open(arguments.compare) as handle:
+      compare(json.load(handle), report)
+  return report
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,100 @@
+import gc
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+
+class ProgramCache:
+  # Stores the tokenized program, block maps and function table on disk, by content hash
+
+  # Bumped when the layout of cache entries changes
+  FORMAT_VERSION = 1
+
+  # Modules whose code decides what goes into an entry
+  FRONT_END_MODULES = ('tokenize.py', 'func.py', 'program.py', 'cache.py')
+
+  def __init__(self, directory):
+    # Directory the entries are stored in, created on the first store
+    self.directory = directory
+    self.version = self.interpreter_version()
+
+  def interpreter_version(self):
+    """Fingerprints the interpreter, so entries written by other versions are never used
+
+    Returns:
+        version (bytes): Digest of the format, Python version and front end source
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{self.FORMAT_VERSION} {marshal.version} {sys.version}'.encode())
+    base = os.path.dirname(os.path.abspath(__file__))
+    for module in self.FRONT_END_MODULES:
+      with open(os.path.join(base, module), 'rb') as handle:
+        digest.update(handle.read())
+    return digest.digest()
+
+  def key(self, program):
+    """Computes the key of a program
+
+    Args:
+        program: An iterable of the lines of the program
+
+    Returns:
+        key (string): Hex digest of the interpreter version and the program text
+    """
+    digest = hashlib.sha256(self.version)
+    for line in program:
+      # Files read with their line breaks share entries with lists of the same lines
+      line = line.rstrip('\r\n').encode()
+      # Each line is prefixed with its length, so lines holding line breaks never match the lines they would split into
+      digest.update(len(line).to_bytes(8, 'little'))
+      digest.update(line)
+    return digest.hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key + '.brewin')
+
+  def load(self, key):
+    """Reads the entry of a program
+
+    Args:
+        key (string): Key of the program
+
+    Returns:
+        entry: The stored entry, None if there is none or it cannot be read
+    """
+    try:
+      with open(self.path(key), 'rb') as handle:
+        data = handle.read()
+    except OSError:
+      return None
+    # Entries are many small lists that cannot form cycles, collecting while loading them only costs time
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+      return marshal.loads(data)
+    except (EOFError, ValueError, TypeError):
+      # Truncated or foreign files are cache misses
+      return None
+    finally:
+      if (collecting):
+        gc.enable()
+
+  def store(self, key, entry):
+    """Writes the entry of a program, replacing the file at once so readers never see part of it
+
+    Args:
+        key (string): Key of the program
+        entry: Tuples, lists, dicts, strings and ints describing the program
+    """
+    try:
+      os.makedirs(self.directory, exist_ok=True)
+      # A file of its own, so processes and threads storing the same key at once never write to the same file
+      with tempfile.NamedTemporaryFile(dir=self.directory, prefix=key + '.', suffix='.tmp', delete=False) as handle:
+        temporary = handle.name
+        marshal.dump(entry, handle)
+      os.replace(temporary, self.path(key))
+    except OSError:
+      # Running without a cache is always fine
+      pass
@@ -0,0 +1,609 @@
+from intbase import InterpreterBase
+from instruction import Opcode, Instruction
+from resolver import Address, Resolver
+from scope import ScopeManager
+from expression import Const, Load
+from typecheck import TypeChecker
+
+
+class Target:
+  # Where an assign statement stores its result
+
+  # A variable
+  VARIABLE = 0
+  # A member of an object variable
+  MEMBER = 1
+  # A member of the object the current method was called on
+  THIS = 2
+  # A variable of the frame proven to be defined and of the type assigned, stored without checks
+  TYPED = 3
+
+  __slots__ = ('kind', 'name', 'address', 'member', 'visible')
+
+  def __init__(self, kind, name, address=None, member=None, visible=None):
+    self.kind = kind
+    # Name as written in the statement
+    self.name = name
+    # Address of the variable, or of the object for members
+    self.address = address
+    self.member = member
+    # Addresses of every name in scope, to find the object of this at run time
+    self.visible = visible
+
+
+class Callee:
+  # What a funccall statement calls
+
+  # An inbuilt function
+  INBUILT = 0
+  # A function defined in the program
+  FUNCTION = 1
+  # A func variable or object member holding a function
+  VARIABLE = 2
+
+  __slots__ = ('kind', 'address', 'object_name', 'member', 'cached')
+
+  def __init__(self, kind, address=None, object_name=None, member=None):
+    self.kind = kind
+    # Address of the variable, or of the object for members
+    self.address = address
+    self.object_name = object_name
+    self.member = member
+    # Inline cache of the call site, the name of the last function called and its CallTarget
+    self.cached = (None, None)
+
+
+class Compiler:
+  # Lowers a tokenized program into a compact instruction stream
+
+  INBUILT_FUNCTIONS = {InterpreterBase.PRINT_DEF, InterpreterBase.STRTOINT_DEF, InterpreterBase.INPUT_DEF}
+
+  # Type of the result variable in each result slot
+  RESULT_TYPES = {slot: value_type for value_type, slot in ScopeManager.RESULT_SLOTS.items()}
+
+  # Types pure functions take and return, values compared by equality and never changed in place
+  PURE_TYPES = {InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF}
+
+  # Inbuilt functions setting a result, whose funccall can be fused with storing it
+  RESULT_FUNCTIONS = {InterpreterBase.STRTOINT_DEF, InterpreterBase.INPUT_DEF}
+
+  def __init__(self, expressions, fuse=True):
+    # ExpressionCompiler turning expressions into cached evaluation plans
+    self.expressions = expressions
+    # Resolver creating the scopes that map variable occurrences to frame slots
+    self.resolver = Resolver()
+    # Reports the type errors statements are certain to raise
+    self.checker = TypeChecker(expressions)
+    # Replace common statements and sequences by superinstructions
+    self.fuse = fuse
+    # Number of superinstructions of each kind created
+    self.fusions = {name: 0 for name in Opcode.FUSED_NAMES.values()}
+
+  def lower(self, tokenized_program, conditional_map, functions):
+    """Decodes every executable statement once into an Instruction
+
+    Blank lines, comments, unknown statements and function headers never
+    do anything when executed, so they are left out of the stream. Jump
+    targets and function entry points are resolved to instruction indices,
+    and variable occurrences to the frame slots they live in.
+
+    Args:
+        tokenized_program ([[string]]): The tokenized program
+        conditional_map (dict): Map of conditional branches and jumps by line
+        functions (FunctionManager): Function definitions of the program
+
+    Returns:
+        instructions ([Instruction]): The instruction stream
+    """
+    instructions = []
+    self.emit(instructions, tokenized_program, 0, len(tokenized_program), conditional_map, functions)
+
+    # Lambda bodies are decoded by the function defining them
+    for function_name in functions.function_defs:
+      line_num = functions.get_line_num(function_name)
+      if (tokenized_program[line_num][0] == InterpreterBase.FUNC_DEF):
+        self.decode_function(instructions, functions, function_name, self.resolver.function_scope())
+
+    return instructions
+
+  def lower_function(self, instructions, tokenized_program, conditional_map, functions, function_name):
+    """Appends a single function, with the lambdas it defines, to the instruction stream
+
+    Lambdas are lowered with the function defining them, names they
+    capture can add slots to its frame.
+
+    Args:
+        instructions ([Instruction]): The instruction stream
+        tokenized_program ([[string]]): The tokenized program, at least from the header to the endfunc of the function
+        conditional_map (dict): Map of conditional branches and jumps by line
+        functions (FunctionManager): Function definitions of the program
+        function_name (string): The function to lower
+    """
+    function = functions.get_function(function_name)
+    self.emit(instructions, tokenized_program, function.line_num, function.end_line + 1, conditional_map, functions)
+    self.decode_function(instructions, functions, function_name, self.resolver.function_scope())
+
+  def emit(self, instructions, tokenized_program, start, stop, conditional_map, functions):
+    """Appends an undecoded Instruction for each executable statement between lines start and stop
+
+    Jump targets and the entry points of functions defined in the lines
+    are resolved to instruction indices.
+
+    Args:
+        instructions ([Instruction]): The instruction stream
+        tokenized_program ([[string]]): The tokenized program
+        start (int): First line
+        stop (int): Line after the last line
+        conditional_map (dict): Map of conditional branches and jumps by line
+        functions (FunctionManager): Function definitions of the program
+    """
+    first = len(instructions)
+    # Index of the first instruction at or after each line, from line start
+    line_index = []
+    for line_num in range(start, stop):
+      statement = tokenized_program[line_num]
+      line_index.append(len(instructions))
+      opcode = Opcode.KEYWORDS.get(statement[0])
+      if (opcode is None):
+        continue
+      # Operands hold the statement until the function containing it is decoded
+      instructions.append(Instruction(opcode, line_num, statement))
+    line_index.append(len(instructions))
+
+    for index in range(first, len(instructions)):
+      instruction = instructions[index]
+      line_num = instruction.line_num
+      match instruction.opcode:
+        case Opcode.IF:
+          # Jump past the else or endif when the condition is false
+          if_map = conditional_map.get(line_num)
+          if (if_map is not None):
+            instruction.target = line_index[if_map[0] - start] + 1
+
+        case Opcode.ELSE:
+          # Reaching an else means the if branch ran, continue after endif
+          if (line_num in conditional_map):
+            instruction.target = line_index[conditional_map[line_num][0] - start] + 1
+
+        case Opcode.WHILE:
+          if (line_num in conditional_map):
+            instruction.target = line_index[conditional_map[line_num] - start] + 1
+
+        case Opcode.ENDWHILE:
+          if (line_num in conditional_map):
+            instruction.target = line_index[conditional_map[line_num] - start]
+
+        case Opcode.LAMBDA:
+          end_line = functions.find_endlambda(line_num)
+          if (end_line is not None):
+            instruction.target = line_index[end_line - start] + 1
+
+    # Functions and lambdas start at the first instruction after their header
+    for line_num in range(start, stop):
+      function_name = functions.get_function_name(line_num)
+      if (function_name is not None):
+        functions.set_entry(function_name, line_index[line_num + 1 - start])
+
+  def decode_function(self, instructions, functions, function_name, top):
+    """Decodes the body of a function or lambda with the names in scope
+
+    Lambdas defined in the body are decoded once the body is done. Names
+    they capture from a lambda body can add slots to its top block, so the
+    frame layout is only recorded after them.
+
+    Args:
+        instructions ([Instruction]): The instruction stream
+        functions (FunctionManager): Function definitions of the program
+        function_name (string): The function or lambda to decode
+        top (BlockScope): Top block of the function
+    """
+    function = functions.get_function(function_name)
+    return_type = function.return_type
+    # Functions the body calls, None once it does something a pure function cannot.
+    # Lambdas read the variables they captured, so they are never pure
+    callees = None
+    if (top.enclosing is None and return_type in self.PURE_TYPES and
+        all(len(parameter) == 2 and parameter[1] in self.PURE_TYPES for parameter in function.parameters)):
+      callees = set()
+    parameter_slots = []
+    for parameter in function.parameters:
+      if (len(parameter) == 3):
+        parameter_slots.append(top.declare_reference(parameter[0], parameter[1]))
+      else:
+        parameter_slots.append(top.declare(parameter[0], parameter[1]))
+
+    # Openers of the bodies holding a var statement, the others get no block at run time
+    declaring = self.declaring_blocks(instructions, functions.get_entry(function_name))
+    # Lambdas defined in the body, with the names visible where they are defined
+    lambdas = []
+    # Open blocks, with the if or while instruction that opened them and the enclosing scope
+    blocks = []
+    scope = top
+    index = functions.get_entry(function_name)
+    while (index < len(instructions)):
+      instruction = instructions[index]
+      statement = instruction.operands
+      opcode = instruction.opcode
+      line_num = instruction.line_num
+      if (opcode == Opcode.ENDFUNC or opcode == Opcode.ENDLAMBDA):
+        instruction.operands = ()
+        break
+
+      if (callees is not None and not self.is_pure(opcode, statement, scope, functions, callees)):
+        callees = None
+      self.checker.check(opcode, statement, line_num, scope, functions, function)
+
+      match opcode:
+        case Opcode.IF:
+          body = self.resolver.block_scope(scope, index in declaring)
+          instruction.operands = [self.expressions.compile(statement[1:], line_num, scope), body, None,
+                                  self.condition_slot(statement, scope)]
+          blocks.append((instruction, scope))
+          scope = body
+
+        case Opcode.ELSE:
+          # Whether the if body ending here has slots to release
+          instruction.operands = (False,)
+          if (blocks):
+            opened, outer = blocks[-1]
+            instruction.operands = (self.block_size(scope) is not None,)
+            scope = self.resolver.block_scope(outer, index in declaring)
+            opened.operands[2] = scope
+
+        case Opcode.WHILE:
+          body = self.resolver.block_scope(scope, index in declaring)
+          instruction.operands = [self.expressions.compile(statement[1:], line_num, scope), body,
+                                  self.condition_slot(statement, scope)]
+          blocks.append((instruction, scope))
+          scope = body
+
+        case Opcode.ENDIF | Opcode.ENDWHILE:
+          # Whether the body ending here has slots to release
+          instruction.operands = (False,)
+          if (blocks):
+            instruction.operands = (self.block_size(scope) is not None,)
+            opened, scope = blocks.pop()
+            self.close_block(opened)
+
+        case Opcode.LAMBDA:
+          instruction.operands = "lambda" + str(line_num)
+          lambdas.append((instruction.operands, scope.snapshot()))
+          if (instruction.target is not None):
+            index = instruction.target
+            continue
+
+        case Opcode.FUNCCALL:
+          tail_type = None
+          if (index + 1 < len(instructions)):
+            tail_type = self.tail_type(instructions[index + 1], scope, return_type)
+          instruction.operands = self.decode_operands(opcode, statement, line_num, scope, functions, tail_type)
+
+        case Opcode.ASSIGN:
+          instruction.operands = self.decode_operands(opcode, statement, line_num, scope, functions)
+          if (self.fuse):
+            self.fuse_assign(instructions, index, statement, scope)
+
+        case _:
+          instruction.operands = self.decode_operands(opcode, statement, line_num, scope, functions)
+      index += 1
+
+    # Close blocks left open by a missing endif or endwhile
+    while (blocks):
+      self.close_block(blocks.pop()[0])
+
+    for lambda_name, snapshot in lambdas:
+      self.decode_function(instructions, functions, lambda_name, self.resolver.lambda_scope(snapshot))
+
+    functions.set_layout(function_name, parameter_slots, top.size, top.captures)
+    functions.set_callees(function_name, callees)
+
+  def is_pure(self, opcode, statement, scope, functions, callees):
+    """Finds whether a statement can be part of a pure function
+
+    Pure statements declare and assign ints, strings and bools of the
+    frame only, never print or read input, and call strtoint or functions
+    of the program, which must be pure as well.
+
+    Args:
+        opcode (int): Opcode of the statement
+        statement ([string]): A tokenized statement
+        scope (BlockScope): Names in scope at the statement
+        functions (FunctionManager): Function definitions of the program
+        callees ({string}): Functions called, the functions the statement calls are added
+
+    Returns:
+        pure (bool): False if the statement has an effect or reads outside the frame
+    """
+    match opcode:
+      case Opcode.VAR:
+        return len(statement) > 1 and statement[1] in self.PURE_TYPES
+
+      case Opcode.ASSIGN:
+        if (len(statement) < 2 or scope.resolve(statement[1]).kind != Address.LOCAL):
+          return False
+        return self.reads_frame(statement[2:], scope)
+
+      case Opcode.IF | Opcode.WHILE | Opcode.RETURN:
+        return self.reads_frame(statement[1:], scope)
+
+      case Opcode.FUNCCALL:
+        if (len(statement) < 2):
+          return False
+        function_name = statement[1]
+        if (function_name != InterpreterBase.STRTOINT_DEF):
+          if (function_name in self.INBUILT_FUNCTIONS or not functions.function_present(function_name)):
+            return False
+          callees.add(function_name)
+        return self.reads_frame(statement[2:], scope)
+
+      case Opcode.LAMBDA:
+        return False
+
+      case _:
+        return True
+
+  def reads_frame(self, tokens, scope):
+    """Finds whether an expression only reads constants and int, string and bool variables of the frame
+
+    Args:
+        tokens ([string]): A tokenized expression
+        scope (BlockScope): Names in scope at the expression
+
+    Returns:
+        frame_only (bool): False if the expression reads objects, references, functions or names bound by the caller
+    """
+    for token in tokens:
+      if (token in self.expressions.operators):
+        continue
+      node = self.expressions.parse_operand(token, scope)
+      if (not isinstance(node, Load)):
+        continue
+      address = node.address
+      if (node.member is not None or address.kind == Address.DYNAMIC or address.kind == Address.REFERENCE):
+        return False
+      if (address.kind == Address.RESULT and self.RESULT_TYPES[address.slot] not in self.PURE_TYPES):
+        return False
+    return True
+
+  def tail_type(self, following, scope, return_type):
+    """Finds whether a funccall is in tail position, its result returned by the next statement
+
+    Args:
+        following (Instruction): The undecoded instruction after the funccall
+        scope (BlockScope): Names in scope at the funccall
+        return_type (string): Return type of the function holding the funccall
+
+    Returns:
+        tail_type (string): Type of the result returned, None if the call is not in tail position
+    """
+    if (following.opcode != Opcode.RETURN or len(following.operands) != 2):
+      return None
+    address = scope.resolve(following.operands[1])
+    if (address.kind != Address.RESULT):
+      return None
+    # Returning a result of another type fails the return type check, calls then run normally
+    result_type = self.RESULT_TYPES[address.slot]
+    return result_type if result_type == return_type else None
+
+  def declaring_blocks(self, instructions, index):
+    """Finds the if, else and while bodies of a function that declare variables
+
+    Blocks are followed the same way decode_function opens and closes them.
+    Lambda bodies are skipped, their var statements belong to the lambda.
+
+    Args:
+        instructions ([Instruction]): The instruction stream, the function not decoded yet
+        index (int): Index of the first instruction of the function
+
+    Returns:
+        declaring ({int}): Indices of the if, else and while instructions opening a body with a var statement
+    """
+    declaring = set()
+    # Index of the instruction opening each open body
+    opened = []
+    while (index < len(instructions)):
+      instruction = instructions[index]
+      match instruction.opcode:
+        case Opcode.ENDFUNC | Opcode.ENDLAMBDA:
+          break
+        case Opcode.IF | Opcode.WHILE:
+          opened.append(index)
+        case Opcode.ELSE:
+          if (opened):
+            opened[-1] = index
+        case Opcode.ENDIF | Opcode.ENDWHILE:
+          if (opened):
+            opened.pop()
+        case Opcode.VAR:
+          if (opened):
+            declaring.add(opened[-1])
+        case Opcode.LAMBDA:
+          if (instruction.target is not None):
+            index = instruction.target
+            continue
+      index += 1
+    return declaring
+
+  def block_size(self, body):
+    # Number of slots of a body, None if it declares nothing and is not allocated
+    return body.size if body.depth > body.parent.depth else None
+
+  def close_block(self, instruction):
+    # Blocks are done, replace their scopes by the number of slots to allocate, None for no block
+    if (instruction.opcode == Opcode.IF):
+      plan, body, else_body, condition = instruction.operands
+      else_size = None if else_body is None else self.block_size(else_body)
+      instruction.operands = (plan, self.block_size(body), else_size)
+      if (condition is not None):
+        self.specialize(instruction, Opcode.IF_VAR, condition + instruction.operands[1:])
+    else:
+      plan, body, condition = instruction.operands
+      instruction.operands = (plan, self.block_size(body))
+      if (condition is not None):
+        self.specialize(instruction, Opcode.WHILE_VAR, condition + instruction.operands[1:])
+
+  def specialize(self, instruction, opcode, operands):
+    """Turns an instruction into a superinstruction, keeping the original to fall back on
+
+    Superinstructions only handle the common case, anything else, errors
+    included, runs the original instruction from the same index.
+
+    Args:
+        instruction (Instruction): A decoded instruction
+        opcode (int): Opcode of the superinstruction
+        operands (tuple): Operands of the superinstruction, the original instruction is appended
+    """
+    original = Instruction(instruction.opcode, instruction.line_num, instruction.operands, instruction.target)
+    instruction.opcode = opcode
+    instruction.operands = operands + (original,)
+    self.fusions[Opcode.FUSED_NAMES[opcode]] += 1
+
+  def local_slot(self, token, scope):
+    # (depth, slot) of a variable of the frame, None for anything else
+    address = scope.resolve(token)
+    if (address.kind != Address.LOCAL):
+      return None
+    return (address.depth, address.slot)
+
+  def condition_slot(self, statement, scope):
+    # (depth, slot) of the variable an if or while tests, None unless the condition is a single variable
+    if (not self.fuse or len(statement) != 2):
+      return None
+    return self.local_slot(statement[1], scope)
+
+  def fuse_assign(self, instructions, index, statement, scope):
+    """Turns an assign incrementing a variable or storing a result into a superinstruction
+
+    A store following a funccall of strtoint or input is also fused with it.
+
+    Args:
+        instructions ([Instruction]): The instruction stream
+        index (int): Index of the decoded assign
+        statement ([string]): The tokenized assign
+        scope (BlockScope): Names in scope at the assign
+    """
+    if (len(statement) < 3):
+      return
+    variable = self.local_slot(statement[1], scope)
+    if (variable is None):
+      return
+    instruction = instructions[index]
+
+    if (len(statement) == 3 and statement[2] in ScopeManager.RESULT_NAMES):
+      self.specialize(instruction, Opcode.STORE_RESULT, variable + (ScopeManager.RESULT_NAMES[statement[2]],))
+      previous = instructions[index - 1] if index > 0 else None
+      # The funccall sets the result right before it is stored, a FUNCCALL before an assign is always decoded
+      if (previous is not None and previous.opcode == Opcode.FUNCCALL and
+          previous.line_num < instruction.line_num and previous.operands[0] in self.RESULT_FUNCTIONS):
+        self.specialize(previous, Opcode.CALL_STORE, ())
+      return
+
+    if (len(statement) == 5 and statement[2] in ('+', '-')):
+      name, operator, left, right = statement[1:]
+      if (left == name):
+        step = self.int_constant(right, scope)
+        if (step is not None and operator == '-'):
+          step = -step
+      elif (right == name and operator == '+'):
+        step = self.int_constant(left, scope)
+      else:
+        step = None
+      if (step is not None):
+        self.specialize(instruction, Opcode.INCREMENT, variable + (step,))
+
+  def int_constant(self, token, scope):
+    # Value of an int literal, None for anything else
+    node = self.expressions.parse_operand(token, scope)
+    if (isinstance(node, Const) and node.value_type[1] == InterpreterBase.INT_DEF):
+      return node.value_type[0]
+    return None
+
+  def decode_operands(self, opcode, statement, line_num, scope, functions, tail_type=None):
+    """Pre-parses the operands of a statement, compiling its expressions
+
+    Args:
+        opcode (int): Opcode of the statement
+        statement ([string]): A tokenized statement
+        line_num (int): Source line of the statement
+        scope (BlockScope): Names in scope at the statement
+        functions (FunctionManager): Function definitions of the program
+        tail_type (string): For funccalls in tail position, the type of the result returned
+
+    Returns:
+        operands: Operands in the layout expected by the opcode's handler
+    """
+    match opcode:
+      # Variable type, (name, slot, duplicate) of each declared variable, and
+      # whether they are declared in the top block
+      case Opcode.VAR:
+        var_type = statement[1] if len(statement) > 1 else None
+        # Variables of a wrong type fail when declared, so they get no type
+        declared_type = var_type if var_type in TypeChecker.TYPES else None
+        declarations = []
+        for name in statement[2:]:
+          duplicate = scope.is_declared(name)
+          declarations.append((name, scope.declare(name, declared_type), duplicate))
+        return (var_type, declarations, scope.depth == 0)
+
+      # Target and expression plan
+      case Opcode.ASSIGN:
+        plan = self.expressions.compile(statement[2:], line_num, scope)
+        target = self.decode_target(statement[1] if len(statement) > 1 else None, scope)
+        if (self.expressions.static_types and target.kind == Target.VARIABLE and target.address.kind == Address.LOCAL):
+          variable_type = scope.type_of(target.name)
+          if (variable_type is not None and variable_type == self.expressions.infer(statement[2:], scope)):
+            target.kind = Target.TYPED
+        return (target, plan)
+
+      # Function name, callee, a plan for each argument, the address of each
+      # argument that can be passed by reference, and the result type the
+      # call must return to reuse the frame, None when not in tail position
+      case Opcode.FUNCCALL:
+        function_name = statement[1] if len(statement) > 1 else None
+        arguments = statement[2:]
+        argument_plans = [self.expressions.compile_operand(token, line_num, scope) for token in arguments]
+        if (function_name in self.INBUILT_FUNCTIONS):
+          return (function_name, Callee(Callee.INBUILT), argument_plans, None, None)
+        if (functions.function_present(function_name)):
+          callee = Callee(Callee.FUNCTION)
+          if (functions.get_return_type(function_name) != tail_type):
+            tail_type = None
+        elif (function_name is None):
+          callee = Callee(Callee.VARIABLE, Address(Address.DYNAMIC))
+        else:
+          address, member = scope.resolve_operand(function_name)
+          callee = Callee(Callee.VARIABLE, address, function_name.split('.')[0], member)
+        references = []
+        for token in arguments:
+          address = scope.resolve(token)
+          references.append(address if address.kind != Address.DYNAMIC else None)
+        return (function_name, callee, argument_plans, references, tail_type)
+
+      # Return value plan, None when returning nothing
+      case Opcode.RETURN:
+        if (len(statement) > 1):
+          return self.expressions.compile(statement[1:], line_num, scope)
+        return None
+
+      case _:
+        return ()
+
+  def decode_target(self, name, scope):
+    """Resolves the target of an assign statement
+
+    Args:
+        name (string): Name being assigned
+        scope (BlockScope): Names in scope at the statement
+
+    Returns:
+        target (Target): Where to store the result
+    """
+    if (name is None):
+      return Target(Target.VARIABLE, name, Address(Address.DYNAMIC))
+    if ('.' in name):
+      object_name = name.split('.')[0]
+      if (object_name == InterpreterBase.THIS_DEF):
+        return Target(Target.THIS, name, visible=scope.visible())
+      member = name.replace(InterpreterBase.THIS_DEF, object_name).split('.')[1]
+      return Target(Target.MEMBER, name, scope.resolve(object_name), member)
+    return Target(Target.VARIABLE, name, scope.resolve(name))
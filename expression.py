@@ -0,0 +1,364 @@
+from intbase import InterpreterBase, ErrorType
+from resolver import Address
+
+
+class Const:
+  # A literal, already parsed into its value and type
+  __slots__ = ('value_type',)
+
+  def __init__(self, value_type):
+    self.value_type = value_type
+
+
+class Load:
+  # A variable, object member or function name
+  __slots__ = ('name', 'address', 'member', 'static_type')
+
+  def __init__(self, name, address, member=None, static_type=None):
+    self.name = name
+    # Address of the variable, or of the object for members
+    self.address = address
+    self.member = member
+    # Type of the variable known before running, None if it is only known at run time
+    self.static_type = static_type
+
+
+class Binary:
+  # An operator applied to a left and a right operand
+  __slots__ = ('operator', 'left', 'right')
+
+  def __init__(self, operator, left, right):
+    self.operator = operator
+    self.left = left
+    self.right = right
+
+
+class Sequence:
+  # Operands left over on the stack, all evaluated but only the last is the result
+  __slots__ = ('items',)
+
+  def __init__(self, items):
+    self.items = items
+
+
+class Malformed:
+  # An expression that evaluates its operands and then raises a syntax error
+  __slots__ = ('items', 'description')
+
+  def __init__(self, items, description):
+    self.items = items
+    self.description = description
+
+
+class Fail:
+  # A constant sub-expression known to raise an error whenever it is evaluated
+  __slots__ = ('error_type', 'description')
+
+  def __init__(self, error_type, description):
+    self.error_type = error_type
+    self.description = description
+
+
+class ExpressionCompiler:
+  # Compiles prefix expressions into reusable evaluation plans
+
+  # Operators whose result is a bool whatever the type of the operands
+  COMPARISONS = {'<', '>', '<=', '>=', '!=', '=='}
+
+  def __init__(self, int_ops, str_ops, bool_ops, fold_constants=True, static_types=True):
+    # Map from operator token to the function and result type for each operand type
+    self.operators = {}
+    for operand_type, ops in ((InterpreterBase.INT_DEF, int_ops),
+                              (InterpreterBase.STRING_DEF, str_ops),
+                              (InterpreterBase.BOOL_DEF, bool_ops)):
+      for token, function in ops.items():
+        result_type = InterpreterBase.BOOL_DEF if token in self.COMPARISONS else operand_type
+        self.operators.setdefault(token, {})[operand_type] = (function, result_type)
+    # Compiled plans, cached per source line
+    self.plans = {}
+    # Fold constant sub-expressions when compiling
+    self.fold_constants = fold_constants
+    # Skip the operand type checks of operators whose operand types are known before running
+    self.static_types = static_types
+    # Errors certain to happen if a line is reached, found while compiling, as (error_type, line_num, description)
+    self.diagnostics = []
+
+  def compile(self, expression, line_num, scope):
+    """Compiles an expression into a plan, reusing the cached plan of the line
+
+    Args:
+        expression ([string]): A tokenized expression
+        line_num (int): Source line of the expression, reported on errors
+        scope (BlockScope): Names in scope at the expression
+
+    Returns:
+        plan: A function taking the interpreter and returning the (value, type) result
+    """
+    plan = self.plans.get(line_num)
+    if (plan is None):
+      node = self.parse(expression, scope)
+      if (self.fold_constants):
+        node = self.fold(node, line_num)
+      plan = self.build(node, line_num)
+      self.plans[line_num] = plan
+    return plan
+
+  def compile_operand(self, token, line_num, scope):
+    """Compiles a single token, as passed to funccall, into a plan
+
+    Args:
+        token (string): Lexical token
+        line_num (int): Source line of the token, reported on errors
+        scope (BlockScope): Names in scope at the token
+
+    Returns:
+        plan: A function taking the interpreter and returning the (value, type) result
+    """
+    return self.build(self.parse_operand(token, scope), line_num)
+
+  def parse(self, expression, scope):
+    """Parses a prefix expression into a tree, the same way the evaluation stack would
+
+    Args:
+        expression ([string]): A tokenized expression
+        scope (BlockScope): Names in scope at the expression
+
+    Returns:
+        node: Root of the expression tree
+    """
+    if (len(expression) < 1):
+      return Malformed([], "Empty expression")
+    stack = []
+    for token in reversed(expression):
+      if (token in self.operators):
+        if (len(stack) < 2):
+          return Malformed(stack, "Invalid Expression Syntax")
+        left = stack.pop()
+        right = stack.pop()
+        stack.append(Binary(token, left, right))
+      else:
+        stack.append(self.parse_operand(token, scope))
+    if (len(stack) == 1):
+      return stack[0]
+    return Sequence(stack)
+
+  def parse_operand(self, token, scope):
+    """Parses a constant into its value and type, anything else is resolved as a name
+
+    Args:
+        token (string): Lexical token
+        scope (BlockScope): Names in scope at the token
+
+    Returns:
+        node: A Const or a Load node
+    """
+    if (token[0] == token[-1] == '\"'):
+      return Const((token[1:-1], InterpreterBase.STRING_DEF))
+    elif (token.lstrip('-').isnumeric()):
+      try:
+        return Const((int(token), InterpreterBase.INT_DEF))
+      except ValueError:
+        # Not a valid integer after all, let evaluation fail on it
+        return Load(token, Address(Address.DYNAMIC))
+    elif (token == InterpreterBase.TRUE_DEF):
+      return Const((True, InterpreterBase.BOOL_DEF))
+    elif (token == InterpreterBase.FALSE_DEF):
+      return Const((False, InterpreterBase.BOOL_DEF))
+    address, member = scope.resolve_operand(token)
+    static_type = None
+    # Variables of the frame and reference parameters always hold a value of their declared type
+    if (member is None and (address.kind == Address.LOCAL or address.kind == Address.REFERENCE)):
+      static_type = scope.type_of(token)
+    return Load(token, address, member, static_type)
+
+  def infer(self, expression, scope):
+    """Finds the type of an expression before running it
+
+    Args:
+        expression ([string]): A tokenized expression
+        scope (BlockScope): Names in scope at the expression
+
+    Returns:
+        value_type (string): Type of the result if evaluating it succeeds, None if it is only known at run time
+    """
+    return self.static_type(self.parse(expression, scope))
+
+  def static_type(self, node):
+    """Finds the type of an expression tree before running it
+
+    Args:
+        node: Root of the expression tree
+
+    Returns:
+        value_type (string): Type of the result if evaluating it succeeds, None if it is only known at run time
+    """
+    if (isinstance(node, Const)):
+      return node.value_type[1]
+    if (isinstance(node, Load)):
+      return node.static_type
+    if (isinstance(node, Binary)):
+      operand_type = self.static_type(node.left)
+      if (operand_type is None or operand_type != self.static_type(node.right)):
+        return None
+      operation = self.operators[node.operator].get(operand_type)
+      return None if operation is None else operation[1]
+    if (isinstance(node, Sequence)):
+      # Every item is evaluated, the last one is the result
+      return self.static_type(node.items[-1])
+    return None
+
+  def fold(self, node, line_num):
+    """Evaluates the constant sub-expressions of a tree ahead of time
+
+    Type errors found in constant sub-expressions are recorded in diagnostics
+    and compiled into nodes raising the same error when evaluated, so that
+    programs fail on the same line and only if the line is reached.
+
+    Args:
+        node: Root of the expression tree
+        line_num (int): Source line of the expression
+
+    Returns:
+        node: Root of the folded expression tree
+    """
+    if (isinstance(node, Binary)):
+      left = self.fold(node.left, line_num)
+      right = self.fold(node.right, line_num)
+      if (not isinstance(left, Const) or not isinstance(right, Const)):
+        return Binary(node.operator, left, right)
+      operand1 = left.value_type
+      operand2 = right.value_type
+      if (operand1[1] != operand2[1]):
+        return self.fold_error(ErrorType.TYPE_ERROR, "Operand types do not match", line_num)
+      operation = self.operators[node.operator].get(operand1[1])
+      if (operation is None):
+        return self.fold_error(ErrorType.TYPE_ERROR, "Operator doesn't match operand type", line_num)
+      try:
+        return Const((operation[0](operand1[0], operand2[0]), operation[1]))
+      except ArithmeticError:
+        # Leave division by zero to fail when evaluated
+        return Binary(node.operator, left, right)
+
+    if (isinstance(node, Sequence)):
+      items = [self.fold(item, line_num) for item in node.items]
+      if (all(isinstance(item, Const) for item in items)):
+        return items[-1]
+      return Sequence(items)
+
+    if (isinstance(node, Malformed)):
+      return Malformed([self.fold(item, line_num) for item in node.items], node.description)
+
+    return node
+
+  def fold_error(self, error_type, description, line_num):
+    self.diagnostics.append((error_type, line_num, description))
+    return Fail(error_type, description)
+
+  def build(self, node, line_num):
+    """Turns an expression tree into nested closures
+
+    Args:
+        node: Root of the expression tree
+        line_num (int): Source line of the expression, reported on errors
+
+    Returns:
+        plan: A function taking the interpreter and returning the (value, type) result
+    """
+    if (isinstance(node, Const)):
+      value_type = node.value_type
+      return lambda interpreter: value_type
+
+    if (isinstance(node, Load)):
+      return self.build_load(node, line_num)
+
+    if (isinstance(node, Binary)):
+      return self.build_binary(node, line_num)
+
+    if (isinstance(node, Fail)):
+      error_type = node.error_type
+      description = node.description
+      return lambda interpreter: interpreter.error(error_type, description, line_num)
+
+    items = [self.build(item, line_num) for item in node.items]
+    if (isinstance(node, Sequence)):
+      def evaluate_sequence(interpreter):
+        for item in items:
+          result = item(interpreter)
+        return result
+      return evaluate_sequence
+
+    description = node.description
+    def evaluate_malformed(interpreter):
+      for item in items:
+        item(interpreter)
+      interpreter.error(ErrorType.SYNTAX_ERROR, description, line_num)
+    return evaluate_malformed
+
+  def build_load(self, node, line_num):
+    name = node.name
+    address = node.address
+    if (node.member is not None):
+      object_name = name.split('.')[0]
+      member = node.member
+      def load_member(interpreter):
+        variable = interpreter.find_variable(address, object_name)
+        if (variable is None):
+          interpreter.error(ErrorType.NAME_ERROR, "Invalid token, variable not found", line_num)
+        if (member not in variable[0]):
+          interpreter.error(ErrorType.NAME_ERROR, "Not an object member", line_num)
+        return variable[0][member]
+      return load_member
+
+    depth = address.depth
+    slot = address.slot
+    if (address.kind == Address.LOCAL):
+      return lambda interpreter: interpreter.scope.blocks[depth][slot]
+
+    if (address.kind == Address.REFERENCE):
+      return lambda interpreter: interpreter.scope.blocks[depth][slot].get()
+
+    if (address.kind == Address.RESULT):
+      def load_result(interpreter):
+        variable = interpreter.scope.blocks[0][slot]
+        if (variable is None):
+          return interpreter.load_dynamic(name, line_num)
+        return variable
+      return load_result
+
+    return lambda interpreter: interpreter.load_dynamic(name, line_num)
+
+  def build_binary(self, node, line_num):
+    operations = self.operators[node.operator]
+    left = self.build(node.left, line_num)
+    right = self.build(node.right, line_num)
+
+    left_type = self.static_type(node.left)
+    right_type = self.static_type(node.right)
+    if (left_type is not None and right_type is not None):
+      operation = operations.get(left_type) if left_type == right_type else None
+      if (operation is None):
+        # Checked when run, where the error is raised
+        if (left_type != right_type):
+          self.diagnostics.append((ErrorType.TYPE_ERROR, line_num, "Operand types do not match"))
+        else:
+          self.diagnostics.append((ErrorType.TYPE_ERROR, line_num, "Operator doesn't match operand type"))
+      elif (self.static_types):
+        # Both operand types are proven, so their checks are left out
+        function, result_type = operation
+        def evaluate_typed(interpreter):
+          operand2 = right(interpreter)[0]
+          return (function(left(interpreter)[0], operand2), result_type)
+        return evaluate_typed
+
+    def evaluate_binary(interpreter):
+      # The right operand sits deeper on the stack, so it is evaluated first
+      operand2 = right(interpreter)
+      operand1 = left(interpreter)
+      operand_type = operand1[1]
+      if (operand_type != operand2[1]):
+        interpreter.error(ErrorType.TYPE_ERROR, "Operand types do not match", line_num)
+      operation = operations.get(operand_type)
+      if (operation is None):
+        interpreter.error(ErrorType.TYPE_ERROR, "Operator doesn't match operand type", line_num)
+      return (operation[0](operand1[0], operand2[0]), operation[1])
+    return evaluate_binary
@@ -1,27 +1,79 @@
 from intbase import InterpreterBase
 
 
+class CallTarget:
+  # Everything a call needs to enter a function, cached by call sites
+
+  __slots__ = ('name', 'return_type', 'entry', 'frame_size', 'parameters', 'memo')
+
+  def __init__(self, name, return_type, entry, frame_size, parameters):
+    self.name = name
+    self.return_type = return_type
+    # Index of the first instruction of the function
+    self.entry = entry
+    # Number of slots of the function's top block
+    self.frame_size = frame_size
+    # (type, is reference, slot) of each formal parameter
+    self.parameters = parameters
+    # MemoCache of the results, for pure functions when memoizing
+    self.memo = None
+
+
+class FunctionDescriptor:
+  # What the source says about a function or lambda, never changed once stored
+
+  __slots__ = ('name', 'line_num', 'end_line', 'parameters', 'return_type')
+
+  def __init__(self, name, line_num, end_line, parameters, return_type):
+    self.name = name
+    # Line of the func or lambda header
+    self.line_num = line_num
+    # Line of the matching endfunc or endlambda, None if it is missing
+    self.end_line = end_line
+    # (name, type) of each formal parameter, (name, type, "ref") for references
+    self.parameters = parameters
+    self.return_type = return_type
+
+
 class FunctionManager:
   def __init__(self):
-    self.lambda_maps = {}
+    # Function descriptors by name and by header line
     self.function_defs = {}
-    self.call_stack = []
-    self.function_stack = []
-    self.function_caller_variable_stack = []
-    self.current_function = None
+    self.function_lines = {}
+    # Compiled layout of each function, by name
+    self.entries = {}
+    self.captures = {}
+    self.call_targets = {}
+    # Functions called by each compiled function, None if the function is impure by itself
+    self.callees = {}
 
-  def store_functions(self,tokenized_program):
+  def store_functions(self,tokenized_program,start=0,stop=None):
+    # Functions between lines start and stop, all of them by default
+    if(stop is None):
+      stop = len(tokenized_program)
+    # Match every header with its end first, so descriptors are complete when stored
+    end_lines = {}
+    function_start = None
     lambda_stack = []
-    for index in range(len(tokenized_program)):
+    for index in range(start, stop):
+      keyword = tokenized_program[index][0]
+      if(keyword == InterpreterBase.FUNC_DEF):
+        function_start = index
+      elif(keyword == InterpreterBase.ENDFUNC_DEF and function_start is not None):
+        end_lines[function_start] = index
+        function_start = None
+      elif(keyword == InterpreterBase.LAMBDA_DEF):
+        lambda_stack.append(index)
+      elif(keyword == InterpreterBase.ENDLAMBDA_DEF and lambda_stack):
+        end_lines[lambda_stack.pop()] = index
+
+    for index in range(start, stop):
       statement = tokenized_program[index]
       if(statement[0] == InterpreterBase.FUNC_DEF or statement[0] == InterpreterBase.LAMBDA_DEF):
         if(statement[0] == InterpreterBase.LAMBDA_DEF):
-          lambda_stack.append(index)
           statement = ["lambda"] + statement
         function_name = statement[1]+str(index) if statement[1] == "lambda" else statement[1]
-        num_parameters = len(statement[2:-1])
         return_type = statement[-1]
-        # TODO: Check for references 
         parameter_types = []
         for pair in statement[2:-1]:
           pair = pair.split(':')
@@ -31,53 +83,100 @@ class FunctionManager:
             parameter_types.append((name,vtype[3:],"ref"))
           else:
             parameter_types.append((name,vtype))
-        self.function_defs[function_name] = {
-          "line_num" : index,
-          "num_parameters" : num_parameters,
-          "parameter_types" : parameter_types,
-          "return_type" : return_type
-        }
-      if(statement[0] == InterpreterBase.ENDLAMBDA_DEF):
-        self.lambda_maps[lambda_stack.pop()] = index
-    
+        self.add_function(FunctionDescriptor(function_name, index, end_lines.get(index), tuple(parameter_types), return_type))
+
+  def add_function(self,function):
+    self.function_defs[function.name] = function
+    self.function_lines[function.line_num] = function
+
+  def export_functions(self):
+    """Lists the function descriptors as plain tuples, in line order
+
+    Returns:
+        functions ([tuple]): Name, line, end line, parameters and return type of each function
+    """
+    return [(function.name, function.line_num, function.end_line, function.parameters, function.return_type)
+            for function in self.function_lines.values()]
+
+  def restore_functions(self,functions):
+    """Stores function descriptors exported by export_functions
+
+    Args:
+        functions ([tuple]): Name, line, end line, parameters and return type of each function
+    """
+    for function in functions:
+      self.add_function(FunctionDescriptor(*function))
+
+  def get_function(self,function_name):
+    return self.function_defs[function_name]
 
   def find_endlambda(self,line_num):
-    return self.lambda_maps[line_num]
+    function = self.function_lines.get(line_num)
+    return None if function is None else function.end_line
 
   def get_function_name(self,line_num):
-    for key in self.function_defs:
-      func = self.function_defs[key]
-      if(func["line_num"] == line_num):
-        return key
-      
-  def get_current_function(self):
-    return self.function_stack[-1]
+    function = self.function_lines.get(line_num)
+    return None if function is None else function.name
 
   def get_line_num(self,function_name):
-    return self.function_defs[function_name]["line_num"]
+    return self.function_defs[function_name].line_num
+
+  def set_entry(self,function_name,index):
+    self.entries[function_name] = index
+
+  def get_entry(self,function_name):
+    return self.entries[function_name]
+
+  def set_layout(self,function_name,parameter_slots,frame_size,captures):
+    function = self.function_defs[function_name]
+    self.captures[function_name] = captures
+    parameters = []
+    for parameter, slot in zip(function.parameters, parameter_slots):
+      parameters.append((parameter[1], len(parameter) == 3, slot))
+    self.call_targets[function_name] = CallTarget(
+      function_name, function.return_type, self.entries[function_name], frame_size, tuple(parameters))
+
+  def set_callees(self,function_name,callees):
+    self.callees[function_name] = callees
+
+  def find_pure_functions(self):
+    """Finds the functions whose result only depends on their arguments
+
+    A function is pure when nothing in its own body has an effect or reads
+    outside its frame, and every function it calls is pure. Functions not
+    compiled yet count as impure, so callers of them are found pure later.
+
+    Returns:
+        pure ({string}): Names of the pure functions
+    """
+    pure = {name for name in self.function_defs if self.callees.get(name) is not None}
+    # Drop functions calling impure ones until none is left, recursion stays pure
+    changed = True
+    while (changed):
+      changed = False
+      for name in list(pure):
+        if (not self.callees[name] <= pure):
+          pure.discard(name)
+          changed = True
+    return pure
+
+  def is_compiled(self,function_name):
+    return function_name in self.call_targets
+
+  def get_call_target(self,function_name):
+    return self.call_targets[function_name]
+
+  def get_captures(self,function_name):
+    return self.captures[function_name]
 
   def get_return_type(self,function_name):
-    return self.function_defs[function_name]["return_type"]
+    return self.function_defs[function_name].return_type
 
   def get_num_parameters(self,function_name):
-    return self.function_defs[function_name]["num_parameters"]
+    return len(self.function_defs[function_name].parameters)
 
   def get_parameters(self,function_name):
-    return self.function_defs[function_name]["parameter_types"]
+    return self.function_defs[function_name].parameters
   
   def function_present(self,function_name):
-    if(function_name not in self.function_defs):
-      return False
-    else:
-      return True
-  
-  def update_stacks(self,call_stack_elem, function_stack_elem, caller_variable):
-    self.call_stack.append(call_stack_elem)
-    self.function_stack.append(function_stack_elem)
-    self.function_caller_variable_stack.append(caller_variable)
-  
-  def pop_stack(self):
-    call_return = self.call_stack.pop()
-    self.function_stack.pop()
-    self.function_caller_variable_stack.pop()
-    return call_return
\ No newline at end of file
+    return function_name in self.function_defs
@@ -0,0 +1,117 @@
+from collections import deque
+import sys
+import weakref
+
+
+class StreamReader:
+  # Lines of a file read in blocks, shared by every input source over the file
+
+  # Bytes read from a file at a time
+  BLOCK_SIZE = 65536
+
+  def __init__(self, stream):
+    """Creates a reader
+
+    Args:
+        stream: File object the lines are read from
+    """
+    self.encoding = getattr(stream, 'encoding', None) or 'utf-8'
+    # Text streams are read through their binary buffer, where read1 returns what is available
+    stream = getattr(stream, 'buffer', stream)
+    self.read = getattr(stream, 'read1', stream.read)
+    # Lines read from the file and not given out yet, and the start of the line after them
+    self.pending = deque()
+    self.partial = None
+    self.at_end = False
+
+  def fill(self):
+    # Reads a block, splitting it into lines and keeping the unterminated end for the next block
+    block = self.read(self.BLOCK_SIZE)
+    if (not block):
+      self.at_end = True
+      if (self.partial):
+        self.pending.append(self.decode(self.partial))
+      self.partial = None
+      return
+    if (self.partial is not None):
+      block = self.partial + block
+    lines = block.split(b'\n' if isinstance(block, bytes) else '\n')
+    self.partial = lines.pop()
+    for line in lines:
+      self.pending.append(self.decode(line))
+
+  def decode(self, line):
+    if (isinstance(line, bytes)):
+      line = line.decode(self.encoding)
+    # Lines of files written on Windows end with a carriage return as well
+    if (line.endswith('\r')):
+      line = line[:-1]
+    return line
+
+
+# Reader of each file read so far, so lines read ahead are not lost when another
+# input source, of a later run or another interpreter, reads the same file
+readers = weakref.WeakKeyDictionary()
+
+
+def stream_reader(stream):
+  """Gives the reader of a file, the same one for every input source over it
+
+  Args:
+      stream: File object
+
+  Returns:
+      reader (StreamReader): The reader of the file
+  """
+  try:
+    reader = readers.get(stream)
+    if (reader is None):
+      reader = readers[stream] = StreamReader(stream)
+    return reader
+  except TypeError:
+    # File-like objects that cannot be weakly referenced are read by this source alone
+    return StreamReader(stream)
+
+
+class InputSource:
+  # Lines of input, read from a file in blocks or taken from any iterable
+
+  def __init__(self, source=None, before_read=None):
+    """Creates an input source
+
+    Args:
+        source: File object or iterable of lines, None for stdin
+        before_read (function): Called before every read that may have to wait, to show prompts
+    """
+    self.source = source
+    self.before_read = before_read
+    # Iterator over the lines when the source is not a file
+    self.lines = None
+    # Lists and tuples are already in memory, reading them never waits
+    self.in_memory = isinstance(source, (list, tuple))
+    if (source is not None and not hasattr(source, 'read')):
+      self.lines = iter(source)
+    # Reader of the file, found on the first read so stdin is the one in use then
+    self.reader = None
+
+  def read_line(self):
+    """Gives the next line of input
+
+    Returns:
+        line (string): The line without its line break, None once the input is exhausted
+    """
+    if (self.lines is not None):
+      if (not self.in_memory and self.before_read is not None):
+        self.before_read()
+      return next(self.lines, None)
+    reader = self.reader
+    if (reader is None):
+      reader = self.reader = stream_reader(self.source if self.source is not None else sys.stdin)
+    pending = reader.pending
+    while (not pending):
+      if (reader.at_end):
+        return None
+      if (self.before_read is not None):
+        self.before_read()
+      reader.fill()
+    return pending.popleft()
@@ -0,0 +1,77 @@
+from intbase import InterpreterBase
+
+
+class Opcode:
+  # Opcodes of the pre-decoded instruction stream, used to index the dispatch table
+  VAR = 0
+  ASSIGN = 1
+  FUNCCALL = 2
+  ENDFUNC = 3
+  LAMBDA = 4
+  ENDLAMBDA = 5
+  IF = 6
+  ELSE = 7
+  ENDIF = 8
+  WHILE = 9
+  ENDWHILE = 10
+  RETURN = 11
+
+  # Superinstructions, specialized or fused from common statements at load time
+  # assign v + v n or assign v - v n on an int variable of the frame
+  INCREMENT = 12
+  # assign v resultX on a variable of the frame
+  STORE_RESULT = 13
+  # funccall of strtoint or input followed by a STORE_RESULT of its result
+  CALL_STORE = 14
+  # if or while on a single bool variable of the frame
+  IF_VAR = 15
+  WHILE_VAR = 16
+
+  # Number of opcodes, size of the dispatch table
+  COUNT = 17
+
+  # Map from the leading keyword of a statement to its opcode
+  KEYWORDS = {
+    InterpreterBase.VAR_DEF: VAR,
+    InterpreterBase.ASSIGN_DEF: ASSIGN,
+    InterpreterBase.FUNCCALL_DEF: FUNCCALL,
+    InterpreterBase.ENDFUNC_DEF: ENDFUNC,
+    InterpreterBase.LAMBDA_DEF: LAMBDA,
+    InterpreterBase.ENDLAMBDA_DEF: ENDLAMBDA,
+    InterpreterBase.IF_DEF: IF,
+    InterpreterBase.ELSE_DEF: ELSE,
+    InterpreterBase.ENDIF_DEF: ENDIF,
+    InterpreterBase.WHILE_DEF: WHILE,
+    InterpreterBase.ENDWHILE_DEF: ENDWHILE,
+    InterpreterBase.RETURN_DEF: RETURN,
+  }
+
+  # Name of each superinstruction, as reported in fusion counts and traces
+  FUSED_NAMES = {
+    INCREMENT: "increment",
+    STORE_RESULT: "store_result",
+    CALL_STORE: "call_store",
+    IF_VAR: "if_var",
+    WHILE_VAR: "while_var",
+  }
+
+  # Opcodes storing to the target of an assign statement
+  ASSIGNS = {ASSIGN, INCREMENT, STORE_RESULT}
+
+
+class Instruction:
+  # A single decoded statement of the instruction stream
+
+  __slots__ = ('opcode', 'line_num', 'operands', 'target')
+
+  def __init__(self, opcode, line_num, operands=(), target=None):
+    self.opcode = opcode
+    # Source line the instruction was decoded from, used for error reporting
+    self.line_num = line_num
+    # Pre-parsed operands, their layout depends on the opcode
+    self.operands = operands
+    # Instruction index to jump to, for branches, loops and lambda definitions
+    self.target = target
+
+  def __repr__(self):
+    return f'Instruction({self.opcode}, line {self.line_num}, {self.operands}, {self.target})'
@@ -1,5 +1,7 @@
 # Base class for our interpreter
 from enum import Enum
+from output import OutputSink, stdout_is_terminal, write_stdout
+from input_source import InputSource
 
 class ErrorType(Enum):
   TYPE_ERROR = 1
@@ -45,15 +47,24 @@ class InterpreterBase:
   ENDLAMBDA_DEF = 'endlambda'
 
   # methods
-  def __init__(self, console_output=True, input=None):
+  def __init__(self, console_output=True, input=None, output_sink=None):
     self.console_output = console_output
-    self.input = input  # if not none, then read input from passed-in list
+    self.input = input  # if not none, then read input from the passed-in list, iterable or file object
+    # where printed lines go, by default to stdout when console_output is set, all of them retained
+    if output_sink is None:
+      # a terminal shows each line as soon as it is printed, pipes and files get blocks,
+      # written before every read and when the run ends
+      buffer_size = 0 if console_output and stdout_is_terminal() else OutputSink.BUFFER_SIZE
+      output_sink = OutputSink(write_stdout if console_output else None, buffer_size)
+    self.output_sink = output_sink
     self.reset()
 
   # Call to reset I/O for another run of the program
   def reset(self):
-    self.output_log = []
-    self.input_cursor = 0
+    self.output_sink.clear()
+    self.output_log = self.output_sink.log
+    # pending output is written before any read that may wait, so prompts show first
+    self.input_source = InputSource(self.input if self.input else None, self.output_sink.flush)
     self.error_type = None
     self.error_line = None
 
@@ -61,16 +72,9 @@ class InterpreterBase:
   def run(self, program):
     pass
 
+  # returns None once the input is exhausted
   def get_input(self):
-    if not self.input:
-      return input()  # Get input from keyboard if not input list provided
-
-    if self.input_cursor < len(self.input):
-      cur_input = self.input[self.input_cursor]
-      self.input_cursor += 1
-      return cur_input
-    else:
-      return None
+    return self.input_source.read_line()
 
   # students must call this for any errors that they run into
   def error(self, error_type, description=None, line_num=None):
@@ -88,12 +92,14 @@ class InterpreterBase:
       raise Exception(f'{error_type} on line {line_num}{description}')
 
   def output(self, v):
-    if self.console_output:
-      print(v)
-    self.output_log.append(v)
+    self.output_sink.write(v)
+
+  # call once the program is done, so buffered output is written
+  def flush_output(self):
+    self.output_sink.flush()
 
   def get_output(self):
-    return self.output_log
+    return self.output_sink.get_log()
 
   def get_error_type_and_line(self):
     return self.error_type, self.error_line
@@ -1,11 +1,14 @@
 from enum import Enum
 from intbase import InterpreterBase
 from intbase import ErrorType
-from tokenize import Tokenizer
-from scope import ScopeManager
-from func import FunctionManager
-import copy
-import operator
+from scope import ScopeManager, Reference
+from compiler import Target, Callee
+from program import Program
+from profiler import Profiler
+from tracer import Tracer
+from instruction import Opcode
+from resolver import Address
+import sys
 
 
 class Interpreter(InterpreterBase):
@@ -15,448 +18,693 @@ class Interpreter(InterpreterBase):
   TYPE = 1
 
   # Interpreter Constructor
-  def __init__(self, console_output=True, input=None, trace_output=False):
-    super().__init__(console_output, input)
+  def __init__(self, console_output=True, input=None, trace_output=False, fold_constants=True, cache_dir=None, lazy_compile=False, output_sink=None, profile=False, memoize=False, fuse=True, static_types=True):
+    super().__init__(console_output, input, output_sink)
 
     # Object Members
-    self.tokenizer = Tokenizer()
     self.scope = ScopeManager()
-    self.functions = FunctionManager()
-
-    # Map of conditional branches and jumps
-    self.conditional_map = {}
-    # Dictionary storing function names and line
-    self.variables = {}
-    # Tokenized program code
-    self.program_code = []
-    # Inbuilt function
-    self.inbuilt_functions = {self.PRINT_DEF,
-                              self.STRTOINT_DEF, self.INPUT_DEF}
-  
+    # Options programs given as source are compiled with
+    self.options = {'fold_constants': fold_constants, 'cache_dir': cache_dir, 'lazy_compile': lazy_compile,
+                    'memoize': memoize, 'fuse': fuse, 'static_types': static_types}
+    # The Program run last and its instruction stream
+    self.program = None
+    self.instructions = []
+    # Times every instruction when profiling, read it once the run is over, profile can be a configured Profiler
+    if (profile is True):
+      profile = Profiler()
+    self.profiler = profile if profile else None
+    # Keeps the last steps, written out when the run fails, trace_output can be a configured Tracer
+    if (trace_output is True):
+      trace_output = Tracer()
+    self.tracer = trace_output if trace_output else None
     # Variable Types
     self.types = {self.INT_DEF,self.STRING_DEF,self.BOOL_DEF, self.FUNC_DEF, self.OBJECT_DEF}
 
-    # Integer operators
-    self.int_ops = {
-        '+': operator.add,
-        '-': operator.sub,
-        '*': operator.mul,
-        '/': operator.floordiv,  # use operator.div for Python 2
-        '%': operator.mod,
-        '<': operator.lt,
-        '>': operator.gt,
-        '<=': operator.le,
-        '>=': operator.ge,
-        '!=': operator.ne,
-        '==': operator.eq,
-    }
-    # String Operators
-    self.str_ops = {
-        '+': operator.add,
-        '<': operator.lt,
-        '>': operator.gt,
-        '<=': operator.le,
-        '>=': operator.ge,
-        '!=': operator.ne,
-        '==': operator.eq,
-    }
-    # Bool Operators
-    self.bool_ops = {
-        '!=': operator.ne,
-        '==': operator.eq,
-        '&': lambda a, b: a and b,
-        '|': lambda a, b: a or b,
-    }
-
-
-  def run(self, program):
+    # Dispatch table from opcode to the handler executing the instruction
+    self.handlers = [None] * Opcode.COUNT
+    self.handlers[Opcode.VAR] = self.evaluate_var
+    self.handlers[Opcode.ASSIGN] = self.evaluate_assign
+    self.handlers[Opcode.FUNCCALL] = self.evaluate_funccall
+    self.handlers[Opcode.ENDFUNC] = self.evaluate_endfunc
+    self.handlers[Opcode.LAMBDA] = self.evaluate_lambda
+    self.handlers[Opcode.ENDLAMBDA] = self.evaluate_endlambda
+    self.handlers[Opcode.IF] = self.evaluate_if
+    self.handlers[Opcode.ELSE] = self.evaluate_else
+    self.handlers[Opcode.ENDIF] = self.evaluate_endif
+    self.handlers[Opcode.WHILE] = self.evaluate_while
+    self.handlers[Opcode.ENDWHILE] = self.evaluate_endwhile
+    self.handlers[Opcode.RETURN] = self.evaluate_return
+    self.handlers[Opcode.INCREMENT] = self.evaluate_increment
+    self.handlers[Opcode.STORE_RESULT] = self.evaluate_store_result
+    self.handlers[Opcode.CALL_STORE] = self.evaluate_call_store
+    self.handlers[Opcode.IF_VAR] = self.evaluate_if_var
+    self.handlers[Opcode.WHILE_VAR] = self.evaluate_while_var
+
+
+  def run(self, program, input=None):
     """This is the primary function in the interpreter that executes Brewin code
 
+    Every run starts over, with no output, no error and the call stack
+    empty. A compiled Program is run as is, so running one many times only
+    pays for compiling it once.
+
     Args:
-        program ([string]): Program stored in a list of strings
+        program: A compiled Program, or the path of the program file or any iterable of its lines
+        input: Input of this run and the ones after it, the input given before when None
     """
-    # Stores tokenized program code in self.program_code
-    self.store_program(program)
-    # Set up function informations
-    self.functions.store_functions(self.program_code)
-    # Set instruction pointer to first line of main
-    self.instruction_poiner = self.functions.get_line_num(self.MAIN_FUNC)
-    self.functions.update_stacks(call_stack_elem=self.MAIN_FUNC, function_stack_elem= self.MAIN_FUNC, caller_variable=self.MAIN_FUNC)
-    # Add main function scope and main's local scope
-    self.scope.function_scopes.append([{}])
-
-    # We run until we reach end of main
-    while (True):
-      # Sanity check
-      if (self.instruction_poiner >= self.total_lines):
-        break
-      # Read a statement
-      statement = self.program_code[self.instruction_poiner]
-      # Match first token
-      match statement[0]:
-        case self.VAR_DEF:
-          self.evaluate_var(statement)
-
-        # Assign value to a variable
-        case self.ASSIGN_DEF:
-          self.evaluate_assign(statement)
-
-        # Function Call
-        case self.FUNCCALL_DEF:
-          self.evaluate_funccall(statement)
-
-        # Function definition
-        case self.FUNC_DEF:
-          self.evaluate_func(statement)
-
-        # End Function
-        case self.ENDFUNC_DEF:
-          continue_execution = self.evaluate_endfunc(statement)
-          if (not continue_execution):
-            return
-
-        case self.LAMBDA_DEF:
-          self.evaluate_lambda(statement)
-
-        case self.ENDLAMBDA_DEF:
-          self.evaluate_endlambda(statement)
-
-        # If block starts
-        case self.IF_DEF:
-          self.evaluate_if(statement)
-
-        # Else block starts
-        case self.ELSE_DEF:
-          self.evaluate_else(statement)
-
-        # If-Else block ends
-        case self.ENDIF_DEF:
-          self.evaluate_endif(statement)
-
-        # While loop starts
-        case self.WHILE_DEF:
-          self.evaluate_while(statement)
-
-        # While loop ends
-        case self.ENDWHILE_DEF:
-          self.evaluate_endwhile(statement)
-        
-        # Return from function and store value in result
-        case self.RETURN_DEF:
-          continue_execution = self.evaluate_return(statement)
-          if (not continue_execution):
-            return
-        
-        case _:
-          # Should never reach here except empty lines, other cases are syntax errors!
-          self.instruction_poiner += 1
-    
+    self.reset(input)
+    if (not isinstance(program, Program)):
+      program = self.compile(program)
+    self.program = program
+    self.instructions = program.instructions
+    # Set instruction pointer to first instruction of main
+    main = self.get_call_target(self.MAIN_FUNC)
+    self.instruction_poiner = main.entry
+    # Add main's frame with its top block
+    self.scope.push_frame(main, None, self.MAIN_FUNC, [None] * main.frame_size)
+
+    instructions = self.instructions
+    handlers = self.handlers
+    # Lazily compiled functions are appended while running and each ends with
+    # its endfunc, so only the endfunc or a return of main ends the loop
+    total_instructions = sys.maxsize if program.lazy_compile else len(instructions)
+    # We run until we reach end of main, writing buffered output however the run ends
+    try:
+      # Profiling and tracing run their own copy of the loop, so runs without them pay nothing
+      if (self.profiler is not None):
+        self.run_profiled(total_instructions)
+        return
+      if (self.tracer is not None):
+        self.run_traced(total_instructions)
+        return
+      while (self.instruction_poiner < total_instructions):
+        instruction = instructions[self.instruction_poiner]
+        # Handlers of endfunc and return report False once main is done
+        if (handlers[instruction.opcode](instruction) is False):
+          return
+    finally:
+      self.flush_output()
+
+  def run_profiled(self, total_instructions):
+    """Runs the dispatch loop like run, charging the time of each instruction to the profiler
+
+    Args:
+        total_instructions (int): Instruction index at which the loop stops
+    """
+    profiler = self.profiler
+    scope = self.scope
+    frames = scope.frames
+    instructions = self.instructions
+    handlers = self.handlers
+    profiler.start(self.scope.frame.function.name, self.program.program_code)
+    try:
+      while (self.instruction_poiner < total_instructions):
+        instruction = instructions[self.instruction_poiner]
+        depth = len(frames)
+        tail_calls = scope.tail_calls
+        done = handlers[instruction.opcode](instruction) is False
+        profiler.record(instruction.line_num, depth, tail_calls, scope)
+        if (done):
+          return
+    finally:
+      profiler.stop()
+
+  def run_traced(self, total_instructions):
+    """Runs the dispatch loop like run, recording each step in the tracer before executing it
+
+    Args:
+        total_instructions (int): Instruction index at which the loop stops
+    """
+    tracer = self.tracer
+    steps = tracer.steps
+    size = tracer.size
+    position = tracer.position
+    values = tracer.values
+    frames = self.scope.frames
+    instructions = self.instructions
+    handlers = self.handlers
+    try:
+      while (self.instruction_poiner < total_instructions):
+        instruction = instructions[self.instruction_poiner]
+        step = position
+        steps[step] = (instruction.line_num, instruction.opcode, len(frames))
+        position += 1
+        if (position == size):
+          position = 0
+        if (handlers[instruction.opcode](instruction) is False):
+          return
+        if (values and instruction.opcode in Opcode.ASSIGNS):
+          steps[step] += (self.assigned_value(instruction),)
+    except Exception:
+      tracer.position = position
+      tracer.dump()
+      raise
+    finally:
+      tracer.position = position
+
+  def assigned_value(self, instruction):
+    """Reads back what an assign statement just stored, for the tracer
+
+    Args:
+        instruction (Instruction): The assign, or a superinstruction made from one
+
+    Returns:
+        value_type: The value and type stored, None for members of this
+    """
+    if (instruction.opcode != Opcode.ASSIGN):
+      # Superinstructions keep the original assign last
+      instruction = instruction.operands[-1]
+    target = instruction.operands[0]
+    if (target.kind == Target.VARIABLE or target.kind == Target.TYPED):
+      return self.find_variable(target.address, target.name)
+    if (target.kind == Target.MEMBER):
+      return self.find_variable(target.address, target.name.split('.')[0])[self.VALUE].get(target.member)
+    return None
+
+  def reset(self, input=None):
+    """Clears what the last run left, so the interpreter can run again
+
+    Frames of the last run go back to the pool, so later runs allocate
+    none until they call deeper.
+
+    Args:
+        input: Input of the runs from now on, the input given before when None
+    """
+    if (input is not None):
+      self.input = input
+    super().reset()
+    # The base constructor resets before the scope and tracer exist
+    if (hasattr(self, 'scope')):
+      self.scope.reset()
+      if (self.tracer is not None):
+        self.tracer.clear()
+      if (self.profiler is not None):
+        self.profiler.clear()
+
+  def compile(self, program):
+    """Compiles a program with the options of this interpreter
+
+    Args:
+        program: Path of the program file, or any iterable of its lines
+
+    Returns:
+        program (Program): The compiled program, which any interpreter can run
+    """
+    compiled = Program(**self.options)
+    compiled.load(program, self.error)
+    return compiled
+
+  def get_fusion_counts(self):
+    """Gives the number of superinstructions the program was compiled into
+
+    Returns:
+        counts (dict): Number of superinstructions of each kind
+    """
+    return self.program.get_fusion_counts()
+
+  def check(self, program):
+    """Compiles a program without running it, reporting the errors certain to happen when their line is reached
+
+    Args:
+        program: Path of the program file, or any iterable of its lines
+
+    Returns:
+        diagnostics ([(ErrorType, int, string)]): Error type, line and description of each error, by line
+    """
+    # Errors left by an earlier run are not errors of this program
+    self.reset()
+    self.program = Program(**self.options)
+    try:
+      self.program.load(program, self.error)
+      # Functions compiled lazily are all compiled now
+      self.program.compile_all(self.error)
+    except Exception as exception:
+      # Syntax errors stop compiling, they are reported with the rest, anything not raised through error is a crash
+      if (self.error_type is None):
+        raise
+      # The message is the error type and line followed by the description
+      self.program.expressions.diagnostics.append((self.error_type, self.error_line, str(exception).partition(': ')[2]))
+    return sorted(self.program.get_diagnostics(), key=lambda diagnostic: diagnostic[1])
+
+  def get_diagnostics(self):
+    """Gives the errors found while compiling, certain to happen if their line is reached
 
-  def evaluate_var(self,statement):
-    # Varaible type
-    var_type = statement[1]
+    Returns:
+        diagnostics ([(ErrorType, int, string)]): Error type, line and description of each error
+    """
+    return [] if self.program is None else self.program.get_diagnostics()
+
+  def get_peak_call_depth(self):
+    """Gives the deepest the call stack has been, main counting as one
+
+    Returns:
+        depth (int): Peak number of frames on the call stack
+    """
+    return self.scope.peak_depth
+
+  def current_line_num(self):
+    """Gives the source line of the instruction being executed, for error reporting
+
+    Returns:
+        line_num (int): Line number of the current instruction
+    """
+    return self.instructions[self.instruction_poiner].line_num
+
+  def get_call_target(self, function_name):
+    """Gives the CallTarget of a function, compiling the function on its first call in lazy mode
+
+    Args:
+        function_name (string): Name of the function
+
+    Returns:
+        target (CallTarget): Entry point and frame layout of the function
+    """
+    return self.program.get_call_target(function_name, self.error)
+
+  def get_memo_stats(self):
+    """Gives the counters of the memo cache
+
+    Returns:
+        stats (dict): Hits, misses and number of results cached, None when not memoizing
+    """
+    return self.program.get_memo_stats()
+
+  def evaluate_var(self,instruction):
+    # Varaible type, declared slots and whether they are in the function's top block
+    var_type, declarations, is_top = instruction.operands
     # Check if unknown type
     if(var_type not in self.types):
-      self.error(ErrorType.TYPE_ERROR, "Variable type is wrong", self.instruction_poiner)
-    var_names = statement[2:]
-    for var_name in var_names:
-      # Check if var not in current scope already
-      if(self.scope.check_in_local_scope(var_name)):
-        self.error(ErrorType.NAME_ERROR,"Duplicate variable definitions within the same block", self.instruction_poiner)
+      self.error(ErrorType.TYPE_ERROR, "Variable type is wrong", self.current_line_num())
+    block = self.scope.blocks[-1]
+    for var_name, slot, duplicate in declarations:
+      # Check if var not in current scope already, the top block also holds results and the object of a method call
+      if(duplicate or block[slot] is not None or (is_top and self.scope.get_binding(var_name) is not None)):
+        self.error(ErrorType.NAME_ERROR,"Duplicate variable definitions within the same block", self.current_line_num())
       else:
         match var_type:
           case self.OBJECT_DEF:
-            self.scope.add_to_local_scope(var_name,({},var_type))
+            block[slot] = ({},var_type)
           case self.FUNC_DEF:
-            # Storing for a function variable,func name, line of function def, passed parameters
-            self.scope.add_to_local_scope(var_name,([None,-1,{}],var_type))
+            # Storing for a function variable,func name, line of function def, captured variables
+            block[slot] = ([None,-1,None],var_type)
           case self.STRING_DEF:
-            self.scope.add_to_local_scope(var_name,("",var_type))
+            block[slot] = ("",var_type)
           case self.INT_DEF:
-            self.scope.add_to_local_scope(var_name,(0,var_type))
+            block[slot] = (0,var_type)
           case self.BOOL_DEF:
-            self.scope.add_to_local_scope(var_name,(False,var_type))
+            block[slot] = (False,var_type)
     self.instruction_poiner += 1
 
-  def evaluate_assign(self, statement):
+  def evaluate_assign(self, instruction):
     """Evaluates an assign statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
+    target, expression = instruction.operands
     # Evaluate expression
-    evaluation_result = self.evaluate_expression(statement[2:])
-    variable_name = statement[1]
-
-    if('.' in variable_name):
-      
-      object_name = variable_name.split('.')[0]
-      if (object_name == self.THIS_DEF):
-        object_name = self.functions.function_caller_variable_stack[-1].split('.')[0]
-      variable_name = variable_name.replace(self.THIS_DEF,object_name)
+    evaluation_result = expression(self)
+
+    if(target.kind == Target.TYPED):
+      # Proven before running to be defined in the frame and of the type assigned
+      self.scope.blocks[target.address.depth][target.address.slot] = evaluation_result
+    elif(target.kind != Target.VARIABLE):
+      if (target.kind == Target.THIS):
+        object_name = self.scope.frame.caller_variable.split('.')[0]
+        object_variable = self.find_visible(object_name, target.visible)
+        member = target.name.replace(self.THIS_DEF,object_name).split('.')[1]
+      else:
+        object_variable = self.find_variable(target.address, target.name.split('.')[0])
+        member = target.member
 
       # Check if variable in any scope
-      if(not self.scope.check_in_function_scope(object_name)):
-        self.error(ErrorType.NAME_ERROR, "Object not found", self.instruction_poiner)
-      index = self.scope.find_scope_num(variable_name.split('.')[0])
-      if(self.scope.get_variable(index,object_name)[self.TYPE] != self.OBJECT_DEF):
-        self.error(ErrorType.TYPE_ERROR,"Not an Object type",self.instruction_poiner)
-      # Set variable
-      self.scope.set_variable(index,variable_name,evaluation_result)
+      if(object_variable is None):
+        self.error(ErrorType.NAME_ERROR, "Object not found", self.current_line_num())
+      if(object_variable[self.TYPE] != self.OBJECT_DEF):
+        self.error(ErrorType.TYPE_ERROR,"Not an Object type",self.current_line_num())
+      # Set member, by value
+      object_variable[self.VALUE][member] = (evaluation_result[self.VALUE],evaluation_result[self.TYPE])
     else:
+      address = target.address
+      variable = self.find_variable(address, target.name)
       # Check if variable in any scope
-      if(not self.scope.check_in_function_scope(variable_name)):
-        self.error(ErrorType.NAME_ERROR, "Variable not found", self.instruction_poiner)
-      
-      # Get variable type from scope
-      index = self.scope.find_scope_num(variable_name)
-      variable_type = self.scope.get_variable(index,variable_name)[self.TYPE]
+      if(variable is None):
+        self.error(ErrorType.NAME_ERROR, "Variable not found", self.current_line_num())
+
       # Check type
-      if(variable_type != evaluation_result[self.TYPE]):
-        self.error(ErrorType.TYPE_ERROR, "Variable type is different than value assigned", self.instruction_poiner)
-      # Set variable
-      self.scope.set_variable(index,variable_name,evaluation_result)
-      self.scope.set_referenced(variable_name)
-      
-    
+      if(variable[self.TYPE] != evaluation_result[self.TYPE]):
+        self.error(ErrorType.TYPE_ERROR, "Variable type is different than value assigned", self.current_line_num())
+      # Set variable, through the reference for reference parameters
+      if(address.kind == Address.REFERENCE):
+        self.scope.blocks[0][address.slot].set((evaluation_result[self.VALUE],evaluation_result[self.TYPE]))
+      elif(address.kind == Address.DYNAMIC or self.scope.blocks[address.depth][address.slot] is None):
+        self.scope.set_binding(target.name,evaluation_result)
+      else:
+        self.scope.set_variable(address.depth,address.slot,evaluation_result)
+
     self.instruction_poiner += 1
 
-  def evaluate_lambda(self,statement):
-    line_num = self.instruction_poiner
-    name = self.functions.get_function_name(line_num)
-    context = copy.deepcopy(self.scope.function_scopes[-1])
+  def evaluate_increment(self, instruction):
+    """Evaluates an assign adding a constant to an int variable of the frame
+
+    Args:
+        instruction (Instruction): A superinstruction
+    """
+    depth, slot, step, original = instruction.operands
+    block = self.scope.blocks[depth]
+    variable = block[slot]
+    if (variable is not None and variable[self.TYPE] == self.INT_DEF):
+      block[slot] = (variable[self.VALUE] + step, self.INT_DEF)
+      self.instruction_poiner += 1
+    else:
+      self.evaluate_assign(original)
+
+  def evaluate_store_result(self, instruction):
+    """Evaluates an assign storing a result variable into a variable of the frame
+
+    Args:
+        instruction (Instruction): A superinstruction
+    """
+    depth, slot, result_slot, original = instruction.operands
+    blocks = self.scope.blocks
+    result = blocks[0][result_slot]
+    variable = blocks[depth][slot]
+    if (result is not None and variable is not None and variable[self.TYPE] == result[self.TYPE]):
+      # Value types are never changed in place, so the result's can be shared
+      blocks[depth][slot] = result
+      self.instruction_poiner += 1
+    else:
+      self.evaluate_assign(original)
+
+  def evaluate_call_store(self, instruction):
+    """Evaluates a funccall of strtoint or input and the store of its result that follows
+
+    Args:
+        instruction (Instruction): A superinstruction
+    """
+    self.execute_inbuilt_function(instruction.operands[0])
+    # The store keeps its own index, so its errors report its own line
+    self.evaluate_store_result(self.instructions[self.instruction_poiner])
+
+  def evaluate_if_var(self, instruction):
+    """Evaluates an if statement testing a variable of the frame
+
+    Args:
+        instruction (Instruction): A superinstruction
+    """
+    depth, slot, body_size, else_size, original = instruction.operands
+    variable = self.scope.blocks[depth][slot]
+    if (variable is None or variable[self.TYPE] != self.BOOL_DEF):
+      self.evaluate_if(original)
+    elif (variable[self.VALUE]):
+      if (body_size is not None):
+        self.scope.add_new_scope(body_size)
+      self.instruction_poiner += 1
+    else:
+      if (else_size is not None):
+        self.scope.add_new_scope(else_size)
+      self.instruction_poiner = instruction.target
+
+  def evaluate_while_var(self, instruction):
+    """Evaluates a while statement testing a variable of the frame
+
+    Args:
+        instruction (Instruction): A superinstruction
+    """
+    depth, slot, body_size, original = instruction.operands
+    variable = self.scope.blocks[depth][slot]
+    if (variable is None or variable[self.TYPE] != self.BOOL_DEF):
+      self.evaluate_while(original)
+    elif (variable[self.VALUE]):
+      if (body_size is not None):
+        self.scope.add_new_scope(body_size)
+      self.instruction_poiner += 1
+    else:
+      self.instruction_poiner = instruction.target
+
+  def evaluate_lambda(self,instruction):
+    line_num = instruction.line_num
+    name = instruction.operands
+    context = self.scope.capture(self.program.functions.get_captures(name))
     self.scope.set_result(-1,([name,line_num,context],self.FUNC_DEF))
-    # Go to the line after end_lambda
-    self.instruction_poiner = self.functions.find_endlambda(self.instruction_poiner)+1
+    # Go to the instruction after end_lambda
+    self.instruction_poiner = instruction.target
 
   # We reach here, only when executing a lambda function
-  def evaluate_endlambda(self,statement):
-    required_return_type = self.functions.get_return_type(self.functions.get_current_function())
-    self.return_default_values(required_return_type)
-    self.instruction_poiner = self.functions.pop_stack()
-    self.scope.function_scopes.pop()
+  def evaluate_endlambda(self,instruction):
+    self.return_default_values(self.scope.frame.function.return_type)
+    self.instruction_poiner = self.scope.pop_frame()
   
 
 
-  def evaluate_funccall(self, statement):
+  def evaluate_funccall(self, instruction):
     """Evaluates an funccall statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
 
-    function_name = statement[1]
+    caller_variable, callee, passed_parameter_plans, references, tail_type = instruction.operands
+    function_name = caller_variable
     # If inbuilt function
-    if (function_name in self.inbuilt_functions):
-      self.execute_inbuilt_function(statement)
-    else:
-      # Sanity check for undefined functions
-      is_lambda = False
-      if (not self.functions.function_present(function_name)):
-        # Check in function variable
-        if( self.scope.find_scope_num(function_name.split('.')[0]) != -1):
-            index = self.scope.find_scope_num(function_name)
-            function_def = self.scope.get_variable(index,function_name)
-            
-            if(function_def == None):
-              self.error(ErrorType.NAME_ERROR, f"Object method {function_name} not defined ", self.instruction_poiner)
-            
-            if(function_def[self.TYPE] != self.FUNC_DEF):
-              self.error(ErrorType.TYPE_ERROR,"Not a function",self.instruction_poiner)
-             
-            if(len(function_def[self.VALUE][2]) > 0):
-              is_lambda = True
-            # For undefined function names, there's a dummy variable
-            function_name = function_def[self.VALUE][0]
-            if(function_name == None):
-              self.instruction_poiner += 1
-              return
-        else:
-          self.error(
-            ErrorType.NAME_ERROR, f"Function {function_name} not defined ", self.instruction_poiner)
-      # Passed parameters
-      passed_parameter_names = statement[2:]
-      passed_parameters = list(map(lambda parameter: self.parse_value_type(parameter),statement[2:]))
-      # Getting the formal parameters of the function
-      formal_parameters = self.functions.get_parameters(function_name)
-      
-      # Check number of parameters matching
-      if(len(passed_parameters) != len(formal_parameters)):
-        self.error(ErrorType.NAME_ERROR,"Wrong number of parameters",self.instruction_poiner)
-      
-      # Adding new function_scope for function called
-      if(is_lambda):
-        self.scope.function_scopes.append(copy.deepcopy(function_def[self.VALUE][2]))
-      elif('.' in statement[1]):
-        object_name = statement[1].split('.')[0]
-        object_def = self.scope.get_variable(index,object_name)
-        self.scope.function_scopes.append([{object_name:object_def}])
-
+    if (callee.kind == Callee.INBUILT):
+      self.execute_inbuilt_function(instruction)
+      return
+    context = None
+    if (callee.kind == Callee.VARIABLE):
+      # Check in function variable
+      if (callee.member is None):
+        function_def = self.find_variable(callee.address, function_name)
       else:
-        self.scope.function_scopes.append([{}])
-      
-      for index in range(len(passed_parameters)):
-        # Parsing type of passed parameter
-        passed_parameter = passed_parameters[index]
-        passed_parameter_name = passed_parameter_names[index]
-        passed_parameter_type = passed_parameter[self.TYPE]
-        
-        # Parsing type of formal parameter
-        formal_parameter = formal_parameters[index]
-        formal_parameter_name = formal_parameter[0]
-        formal_parameter_type = formal_parameter[1]
-        
-        # For pass by reference, the passed parameter must be a variable
-        is_passed_parameter_variable = self.scope.check_in_function_scope(passed_parameter_name,-2)
-        is_formal_parameter_reference = True if len(formal_parameter) == 3 else False
-        pass_by_reference = is_passed_parameter_variable and is_formal_parameter_reference
- 
-        # Checking type compatability
-        if(passed_parameter_type != formal_parameter_type):
-          self.error(ErrorType.TYPE_ERROR,"Wrong type of Parameters", self.instruction_poiner)
-        
-        # Checking if pass-by-reference
-        if(pass_by_reference):
-          self.scope.add_to_local_scope(formal_parameter_name,(passed_parameter[self.VALUE],passed_parameter[self.TYPE],passed_parameter_name))
+        object_name = callee.object_name
+        object_def = self.find_variable(callee.address, object_name)
+        if (object_def is None):
+          function_def = None
         else:
-          self.scope.add_to_local_scope(formal_parameter_name,(passed_parameter[self.VALUE],passed_parameter[self.TYPE]))
-
-      # Add next line to call stack and jump to called function
-      self.functions.update_stacks(call_stack_elem=self.instruction_poiner + 1, function_stack_elem=function_name, caller_variable= statement[1])
-      # Go to the next line of func or lambda definition
-      self.instruction_poiner = self.functions.get_line_num(function_name)+1
+          function_def = object_def[self.VALUE].get(callee.member)
+          if(function_def == None):
+            self.error(ErrorType.NAME_ERROR, f"Object method {function_name} not defined ", self.current_line_num())
+      if (function_def is None):
+        self.error(
+          ErrorType.NAME_ERROR, f"Function {function_name} not defined ", self.current_line_num())
+
+      if(function_def[self.TYPE] != self.FUNC_DEF):
+        self.error(ErrorType.TYPE_ERROR,"Not a function",self.current_line_num())
+
+      # Lambdas carry the variables they captured
+      context = function_def[self.VALUE][2]
+      # For undefined function names, there's a dummy variable
+      function_name = function_def[self.VALUE][0]
+      if(function_name == None):
+        self.instruction_poiner += 1
+        return
+    # Look the function up only when the call site calls a different one than last time.
+    # The name and target are replaced together, runs in other threads share the call site
+    cached = callee.cached
+    if (cached[0] != function_name):
+      cached = (function_name, self.get_call_target(function_name))
+      callee.cached = cached
+    target = cached[1]
+    # Passed parameters
+    passed_parameters = [plan(self) for plan in passed_parameter_plans]
+    # Getting the formal parameters of the function
+    formal_parameters = target.parameters
+
+    # Check number of parameters matching
+    if(len(passed_parameters) != len(formal_parameters)):
+      self.error(ErrorType.NAME_ERROR,"Wrong number of parameters",self.current_line_num())
+
+    # Creating the top block of the function called
+    frame_size = target.frame_size
+    if(context is not None):
+      # Lambdas start with a copy of the variables they captured
+      top, bindings = context.open(frame_size)
+    elif(callee.member is not None):
+      top = [None] * frame_size
+      bindings = {object_name:object_def}
+    else:
+      top = [None] * frame_size
+      bindings = None
 
+    for index in range(len(passed_parameters)):
+      passed_parameter = passed_parameters[index]
+      formal_parameter_type, is_reference, slot = formal_parameters[index]
 
-  def evaluate_func(self, statement):
-    """Evaluates an func statement
+      # Checking type compatability
+      if(passed_parameter[self.TYPE] != formal_parameter_type):
+        self.error(ErrorType.TYPE_ERROR,"Wrong type of Parameters", self.current_line_num())
 
-    Args:
-        statement ([string]): A tokenized statement
-    """
-    self.instruction_poiner += 1
+      # Checking if pass-by-reference, reference parameters always hold a Reference
+      if(is_reference):
+        # For pass by reference, the passed parameter must be a variable
+        address = references[index]
+        reference = None if address is None else self.scope.get_reference(address.depth,address.slot)
+        if(reference is None):
+          reference = Reference([(passed_parameter[self.VALUE],passed_parameter[self.TYPE])],0)
+        elif(reference.block is self.scope.blocks[address.depth]):
+          # A variable of this frame must outlive the call, so the frame cannot be reused
+          tail_type = None
+        top[slot] = reference
+      else:
+        top[slot] = (passed_parameter[self.VALUE],passed_parameter[self.TYPE])
+
+    # Pure functions return what they returned for the same arguments before
+    memo_key = None
+    if(target.memo is not None):
+      memo_key = (function_name,) + tuple([passed_parameter[self.VALUE] for passed_parameter in passed_parameters])
+      result = target.memo.get(memo_key)
+      if(result is not None):
+        self.scope.set_result(-1,result)
+        self.instruction_poiner += 1
+        return
+      # The result is cached when the frame returns, so the frame must be its own
+      tail_type = None
+
+    # A call whose result is returned right away reuses the frame, returning straight to our caller.
+    # Main's frame is kept, returning from it ends the program
+    if(tail_type is not None and target.return_type == tail_type and len(self.scope.frames) > 1):
+      self.scope.replace_frame(target, caller_variable, top, bindings)
+    else:
+      # Push the frame returning to the next line and jump to called function
+      self.scope.push_frame(target, self.instruction_poiner + 1, caller_variable, top, bindings)
+      if(memo_key is not None):
+        self.scope.frame.memo_key = memo_key
+    # Go to the first instruction of func or lambda definition
+    self.instruction_poiner = target.entry
 
 
-  def evaluate_endfunc(self, statement):
+  def evaluate_endfunc(self, instruction):
     """Evaluates an endfunc statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     Returns:
         (bool): True if program should continue, False to exit
     """
-    if (len(self.functions.call_stack) > 1):
-      required_return_type = self.functions.get_return_type(self.functions.get_current_function())
-      self.return_default_values(required_return_type)
-      self.instruction_poiner = self.functions.pop_stack()
-      self.scope.function_scopes.pop()
+    if (len(self.scope.frames) > 1):
+      self.return_default_values(self.scope.frame.function.return_type)
+      self.memoize_default_value()
+      self.instruction_poiner = self.scope.pop_frame()
       return True
-    # If call_stack just has "main" and we reach endfunc, exit
+    # If the call stack just has "main" and we reach endfunc, exit
     else:
       return False
 
 
-  def evaluate_if(self, statement):
+  def evaluate_if(self, instruction):
     """Evaluates an if statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    result = self.evaluate_expression(statement[1:])
+    # Bodies declaring no variables have no block, their size is None
+    expression, body_size, else_size = instruction.operands
+    result = expression(self)
     # If expression doesn't return bool give TYPE_ERROR
     if ( result[self.TYPE] != self.BOOL_DEF ):
       self.error(ErrorType.TYPE_ERROR,
-                 "Expression result is not a bool", self.instruction_poiner)
+                 "Expression result is not a bool", self.current_line_num())
     if (result[self.VALUE] == True):
-      self.scope.add_new_scope()
+      if (body_size is not None):
+        self.scope.add_new_scope(body_size)
       self.instruction_poiner += 1
       
     else:
       # Go to else + 1
-      if_map = self.conditional_map[self.instruction_poiner]
-      # If there's an else only then add a scope
-      if(len(if_map) == 2):
-        self.scope.add_new_scope()
-      self.instruction_poiner = if_map[0] + 1
+      # If there's an else declaring variables only then add a scope
+      if(else_size is not None):
+        self.scope.add_new_scope(else_size)
+      self.instruction_poiner = instruction.target
 
 
-  def evaluate_else(self, statement):
+  def evaluate_else(self, instruction):
     """Evaluates an else statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    # If we reach here, then if stmt was true, go to endif
-    self.instruction_poiner = self.conditional_map[self.instruction_poiner][0]
+    # If we reach here, then if stmt was true, leave its block and go past endif
+    if (instruction.operands[0]):
+      self.scope.delete_current_scope()
+    self.instruction_poiner = instruction.target
 
 
-  def evaluate_endif(self, statement):
+  def evaluate_endif(self, instruction):
     """Evaluates an endif statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    self.scope.delete_current_scope()
+    if (instruction.operands[0]):
+      self.scope.delete_current_scope()
     self.instruction_poiner += 1
 
 
-  def evaluate_while(self, statement):
+  def evaluate_while(self, instruction):
     """Evaluates a while statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    result = self.evaluate_expression(statement[1:])
+    # Bodies declaring no variables have no block, their size is None
+    expression, body_size = instruction.operands
+    result = expression(self)
     # If expression doesn't return bool give TYPE_ERROR
     if (result[self.TYPE] != self.BOOL_DEF):
       self.error(ErrorType.TYPE_ERROR,
-                 "Expression result is not a bool", self.instruction_poiner)
+                 "Expression result is not a bool", self.current_line_num())
     if (result[self.VALUE] == True):
-      self.scope.add_new_scope()
+      if (body_size is not None):
+        self.scope.add_new_scope(body_size)
       self.instruction_poiner += 1
     else:
-      self.instruction_poiner = self.conditional_map[self.instruction_poiner] + 1
+      self.instruction_poiner = instruction.target
 
 
-  def evaluate_endwhile(self, statement):
+  def evaluate_endwhile(self, instruction):
     """Evaluates an endwhile statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    self.scope.delete_current_scope()
-    self.instruction_poiner = self.conditional_map[self.instruction_poiner]
+    if (instruction.operands[0]):
+      self.scope.delete_current_scope()
+    self.instruction_poiner = instruction.target
 
 
-  def evaluate_return(self, statement):
+  def evaluate_return(self, instruction):
     """Evaluates a return statement
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     Returns:
         (bool): True if program should continue, False to exit
     """
+    expression = instruction.operands
     # Setting results
-    required_return_type = self.functions.get_return_type(self.functions.get_current_function())
+    required_return_type = self.scope.frame.function.return_type
     
-    if (len(self.functions.call_stack) == 1):
-      if(len(statement) > 1):
+    if (len(self.scope.frames) == 1):
+      if(expression is not None):
         if(required_return_type == self.VOID_DEF):
-          self.error(ErrorType.TYPE_ERROR,"Wrong return type", self.instruction_poiner)
+          self.error(ErrorType.TYPE_ERROR,"Wrong return type", self.current_line_num())
       return False
 
     
-    if (len(statement) > 1):
-      return_value_type = self.evaluate_expression(statement[1:])
+    if (expression is not None):
+      return_value_type = expression(self)
       if(return_value_type[self.TYPE] != required_return_type):
-        self.error(ErrorType.TYPE_ERROR,"Wrong return type",self.instruction_poiner)
+        self.error(ErrorType.TYPE_ERROR,"Wrong return type",self.current_line_num())
       else:
         # Setting result in top scope of calling function
         self.scope.set_result(-2,return_value_type)
+        if (self.scope.frame.memo_key is not None):
+          self.program.memo.put(self.scope.frame.memo_key, (return_value_type[self.VALUE],return_value_type[self.TYPE]))
     else:
       self.return_default_values(required_return_type)
+      self.memoize_default_value()
 
-    self.instruction_poiner = self.functions.pop_stack()
-    self.scope.function_scopes.pop()
+    self.instruction_poiner = self.scope.pop_frame()
     return True
 
     
@@ -468,40 +716,45 @@ class Interpreter(InterpreterBase):
     elif (return_type == self.BOOL_DEF):
       self.scope.set_result(-2,(False,self.BOOL_DEF))
     elif (return_type == self.FUNC_DEF):
-      self.scope.set_result(-2,([None,-1,{}],self.FUNC_DEF))
+      self.scope.set_result(-2,([None,-1,None],self.FUNC_DEF))
     elif (return_type == self.OBJECT_DEF):
       self.scope.set_result(-2,({},self.OBJECT_DEF))
     else:
       pass
 
-  def execute_inbuilt_function(self, statement):
+  def memoize_default_value(self):
+    # Caches the default value a memoized function just returned, read back from the caller's result slot
+    frame = self.scope.frame
+    if (frame.memo_key is not None):
+      slot = ScopeManager.RESULT_SLOTS[frame.function.return_type]
+      self.program.memo.put(frame.memo_key, self.scope.frames[-2].blocks[0][slot])
+
+  def execute_inbuilt_function(self, instruction):
     """Executes an inbuilt function
 
     Args:
-        statement ([string]): A tokenized statement
+        instruction (Instruction): A decoded statement
     """
-    function_name = statement[1]
+    function_name, callee, argument_plans, references, tail_type = instruction.operands
     match function_name:
       # Inbuilt print funtion
       case self.PRINT_DEF:
-        output_str = "".join(
-            list(map(lambda token: str(self.parse_value_type(token)[self.VALUE]), statement[2:])))
+        output_str = "".join([str(plan(self)[self.VALUE]) for plan in argument_plans])
         self.output(output_str)
 
       # Inbuilt input function
       case self.INPUT_DEF:
-        output_str = "".join(
-            list(map(lambda token: str(self.parse_value_type(token)[self.VALUE]), statement[2:])))
+        output_str = "".join([str(plan(self)[self.VALUE]) for plan in argument_plans])
         self.output(output_str)
         input = self.get_input()
         self.scope.set_result(-1,(input,self.STRING_DEF))
 
       # Inbuilt strtoint function
       case self.STRTOINT_DEF:
-        parsed_value = self.parse_value_type(statement[2])
+        parsed_value = argument_plans[0](self)
         if (parsed_value[self.TYPE] != self.STRING_DEF):
           self.error(
-              ErrorType.TYPE_ERROR, "Passed value is not a string", self.instruction_poiner)
+              ErrorType.TYPE_ERROR, "Passed value is not a string", self.current_line_num())
         else:
           self.scope.set_result(-1,(int(parsed_value[self.VALUE]),self.INT_DEF))
 
@@ -510,148 +763,61 @@ class Interpreter(InterpreterBase):
     self.instruction_poiner += 1
 
 
-  def evaluate_expression(self, expression):
-    """Evaluate an expression a variable or a constant
+  def find_variable(self, address, name):
+    """Finds the variable at a resolved address
 
     Args:
-        expression ([string]): A tokenized expression
+        address (Address): Address the name was resolved to
+        name (string): Name of the variable
 
     Returns:
-        result: Result of expression evaluation
+        variable: The value_type of the variable, None if it is not defined
     """
-    # Reverse the expressions to push into stack
-    expression.reverse()
-    stack = []
-    if (len(expression) < 1):
-      self.error(ErrorType.SYNTAX_ERROR, "Empty expression",
-                 self.instruction_poiner)
-    for i in range(len(expression)):
-      token = expression[i]
-      # If token is an operation, pop2 -> evaluate ->push
-      if (token in self.int_ops or token in self.str_ops or token in self.bool_ops):
-        # Checks if operands are of correct types\
-        if(len(stack) < 2):
-          self.error(ErrorType.SYNTAX_ERROR, "Invalid Expression Syntax", self.instruction_poiner)
-        operand1 = stack[-1]
-        operand2 = stack[-2]
-        if (operand1[self.TYPE] != operand2[self.TYPE]):
-          self.error(
-              ErrorType.TYPE_ERROR, "Operand types do not match", self.instruction_poiner)
-        # Uses correct operator type on the operand
-        if (operand1[self.TYPE] == self.STRING_DEF and token in self.str_ops):
-          evaluated = self.str_ops[token](operand1[self.VALUE], operand2[self.VALUE])
-        elif (operand1[self.TYPE] == self.INT_DEF and token in self.int_ops):
-          evaluated = self.int_ops[token](operand1[self.VALUE], operand2[self.VALUE])
-        elif (operand1[self.TYPE] == self.BOOL_DEF and token in self.bool_ops):
-          evaluated = self.bool_ops[token](operand1[self.VALUE], operand2[self.VALUE])
-        else:
-          self.error(
-              ErrorType.TYPE_ERROR, "Operator doesn't match operand type", self.instruction_poiner)
-        stack = stack[:-2]
-        stack.append((evaluated, self.get_type_value(evaluated)))
+    if (address.kind == Address.LOCAL):
+      return self.scope.blocks[address.depth][address.slot]
+    if (address.kind == Address.REFERENCE):
+      return self.scope.blocks[0][address.slot].get()
+    if (address.kind == Address.RESULT):
+      variable = self.scope.blocks[0][address.slot]
+      if (variable is not None):
+        return variable
+    # Names nothing declares can only be bound by the caller
+    return self.scope.get_binding(name)
 
-      # Else push the operand on stack after parsing value
-      else:
-        parsed_operand = self.parse_value_type(token)
-        stack.append(parsed_operand)
-    result = stack.pop()
-    return result
+  def find_visible(self, name, visible):
+    """Finds a variable known by name only at run time
 
-    
-  def get_type_value(self,value):
-    if(type(value) == int):
-      return self.INT_DEF
-    elif(type(value) == str):
-      return self.STRING_DEF
-    elif(type(value) == bool):
-        return self.BOOL_DEF
-    else:
-      return None
+    Args:
+        name (string): Name of the variable
+        visible (dict): Map from each name in scope to its (depth, slot)
 
-  # Parses constants and variables to get the value and type
-  def parse_value_type(self, token):
-    """Parses a token to give its barebones form
+    Returns:
+        variable: The value_type of the variable, None if it is not defined
+    """
+    found = visible.get(name)
+    if (found is not None):
+      variable = self.scope.blocks[found[0]][found[1]]
+      return variable.get() if type(variable) is Reference else variable
+    if (name in ScopeManager.RESULT_NAMES):
+      return self.find_variable(Address(Address.RESULT, 0, ScopeManager.RESULT_NAMES[name]), name)
+    return self.scope.get_binding(name)
+
+  # Looks up names that were not resolved to a slot, to get the value and type
+  def load_dynamic(self, token, line_num):
+    """Loads a name no declaration was found for when compiling
 
     Args:
         token (string): Lexical token
+        line_num (int): Source line of the token, reported on errors
 
     Returns:
         token_value: Value of the token
     """
-    if (token[0] == token[-1] == '\"'):
-      return (token[1:-1],self.STRING_DEF)
-    elif (token.lstrip('-').isnumeric()):
-      return (int(token),self.INT_DEF)
-    elif (token == "True"):
-      return (True, self.BOOL_DEF)
-    elif (token == "False"):
-      return (False, self.BOOL_DEF)
-    elif (self.scope.find_scope_num(token) != -1):
-      index = self.scope.find_scope_num(token)
-      variable = self.scope.get_variable(index,token)
+    variable = self.scope.get_binding(token)
+    if (variable is not None):
       return variable
-    elif ('.' in  token):
-      object_name = token.split('.')[0]
-      if (self.scope.find_scope_num(object_name) != -1):
-        index = self.scope.find_scope_num(object_name)
-        variable = self.scope.get_variable(index,token)
-        if(variable == None):
-          self.error(ErrorType.NAME_ERROR,"Not an object member",self.instruction_poiner)
-        return variable
-    elif(self.functions.function_present(token)):
-      return([token,self.functions.get_line_num(token),{}],self.FUNC_DEF)
-    else:
-      pass
-    
-    return self.error(ErrorType.NAME_ERROR, "Invalid token, variable not found", self.instruction_poiner)
-
-
-  # Reads the input and stores a tokenized version of the code
-  def store_program(self, program):
-    """Converts the list of statements to a tokenized version
-
-    Args:
-        program ([string]): A list of stements
-    """
-    for line in program:
-      line = line.lstrip()  # Removing leading whitespace
-      line = line.rstrip()  # Removing trailing whitespace
-      self.program_code.append(line)
-
-    # Total number of lines on the program
-    self.total_lines = len(self.program_code)
-    if_stack = []
-    while_stack = []
-    for index in range(self.total_lines):
-      line = self.program_code[index]
-      tokenized_line = self.tokenizer.tokenize(line)
-
-      # Replacing line string with tokenized version
-      self.program_code[index] = tokenized_line
-      match tokenized_line[0]:
-
-        case self.IF_DEF:
-          if_stack.append([index])
-
-        case self.ELSE_DEF:
-          if_stack[-1].append(index)
-
-        case self.ENDIF_DEF:
-          last_if = if_stack.pop()
-          last_if.append(index)
-          # Setting map from if to else and endif
-          if_line = last_if[0]
-          others = last_if[1:]
-          self.conditional_map[if_line] = others
-          # Setting map from else to endif
-          if (len(others) == 2):
-            self.conditional_map[others[0]] = [others[1]]
-
-        case self.WHILE_DEF:
-          while_stack.append(index)
-
-        case self.ENDWHILE_DEF:
-          last_while = while_stack.pop()
-          self.conditional_map[last_while] = index
-          self.conditional_map[index] = last_while
+    functions = self.program.functions
+    if(functions.function_present(token)):
+      return([token,functions.get_line_num(token),None],self.FUNC_DEF)
 
+    return self.error(ErrorType.NAME_ERROR, "Invalid token, variable not found", line_num)
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+import threading
+
+
+class MemoCache:
+  # Results of pure functions keyed on the function and its argument values, the least recently used dropped first
+
+  # Results kept by default
+  SIZE = 65536
+
+  def __init__(self, size=SIZE):
+    """Creates a memo cache
+
+    Args:
+        size (int): Number of results kept
+    """
+    self.size = size
+    # Map from (function name, argument values...) to the value_type returned
+    self.results = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    # Runs of a program in several threads share its cache
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    """Looks a call up, counting a hit or a miss
+
+    Args:
+        key (tuple): Name of the function followed by the value of each argument
+
+    Returns:
+        value_type: The value and type the call returned, None if it is not cached
+    """
+    with self.lock:
+      value_type = self.results.get(key)
+      if (value_type is None):
+        self.misses += 1
+        return None
+      self.hits += 1
+      self.results.move_to_end(key)
+      return value_type
+
+  def put(self, key, value_type):
+    """Caches the result of a call, dropping the least recently used result when full
+
+    Args:
+        key (tuple): Name of the function followed by the value of each argument
+        value_type: The value and type returned
+    """
+    results = self.results
+    with self.lock:
+      results[key] = value_type
+      # A result stored again is the most recently used, whether or not it was cached before
+      results.move_to_end(key)
+      if (len(results) > self.size):
+        results.popitem(last=False)
+
+  def clear(self):
+    # Drops the cached results and resets the counters
+    with self.lock:
+      self.results.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def stats(self):
+    """Gives the counters of the cache
+
+    Returns:
+        stats (dict): Hits, misses and number of results cached
+    """
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self.results)}
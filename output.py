@@ -0,0 +1,82 @@
+from collections import deque
+import sys
+
+
+def write_stdout(text):
+  # Looks sys.stdout up on every write, so redirecting it after the sink is created works
+  sys.stdout.write(text)
+  sys.stdout.flush()
+
+
+def stdout_is_terminal():
+  # Whether someone may be watching stdout as lines are printed
+  isatty = getattr(sys.stdout, 'isatty', None)
+  return isatty is not None and isatty()
+
+
+class OutputSink:
+  # Collects printed lines, writing them to a target in blocks and retaining some of them
+
+  # Characters buffered before a write, the size of a typical file buffer
+  BUFFER_SIZE = 8192
+
+  def __init__(self, target=None, buffer_size=BUFFER_SIZE, retain=None):
+    """Creates a sink
+
+    Lines are written once buffer_size characters are waiting, when flush is
+    called, and by the interpreter before reading input and when a run ends.
+
+    Args:
+        target: File object or function called with each block of text, None to only retain lines
+        buffer_size (int): Characters to buffer before writing, 0 writes every line, None only writes on flush
+        retain (int): Number of most recent lines kept for get_log, None keeps all of them
+    """
+    if (target is None or callable(target)):
+      self.write_target = target
+      self.flush_target = None
+    else:
+      self.write_target = target.write
+      self.flush_target = getattr(target, 'flush', None)
+    self.buffer_size = buffer_size
+    self.retain = retain
+    # Lines waiting to be written, and their size with line breaks
+    self.buffer = []
+    self.buffered = 0
+    self.clear()
+
+  def clear(self):
+    # A bounded deque drops the oldest line once full, and every line when the bound is 0
+    self.log = [] if self.retain is None else deque(maxlen=self.retain)
+
+  def write(self, line):
+    """Outputs a line
+
+    Args:
+        line (string): The line, without a line break
+    """
+    self.log.append(line)
+    if (self.write_target is not None):
+      self.buffer.append(line)
+      self.buffered += len(line) + 1
+      if (self.buffer_size is not None and self.buffered >= self.buffer_size):
+        self.flush()
+
+  def flush(self):
+    # Writes the buffered lines to the target as a single block
+    if (self.buffer):
+      text = "\n".join(self.buffer) + "\n"
+      self.buffer = []
+      self.buffered = 0
+      self.write_target(text)
+      if (self.flush_target is not None):
+        self.flush_target()
+
+  def get_log(self):
+    """Gives the retained lines
+
+    Returns:
+        lines ([string]): All lines, or the most recent ones when retention is bounded
+    """
+    if (self.retain is None):
+      return self.log
+    return list(self.log)
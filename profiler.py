@@ -0,0 +1,180 @@
+import time
+
+
+class Profiler:
+  # Times every instruction of a run, by source line, by function and by call stack
+
+  def __init__(self, clock=time.perf_counter):
+    self.clock = clock
+    self.clear()
+
+  def clear(self):
+    # Drops what earlier runs recorded, so the next run is profiled on its own
+
+    # Statements of the program, by line, shown next to the line counts
+    self.statements = None
+    # [executions, seconds] of each line
+    self.lines = {}
+    # [calls, self seconds, inclusive seconds] of each function
+    self.functions = {}
+    # Call stacks form a tree, node ids index the name, parent and self seconds of each node
+    self.node_ids = {}
+    self.node_names = []
+    self.node_parents = []
+    self.node_times = []
+    # Node of each frame on the call stack, and when it was entered
+    self.stack = []
+    self.entered = []
+    # Activations of each function on the call stack, recursive calls count once for inclusive time
+    self.active = {}
+    self.last = None
+
+  def start(self, function_name, statements):
+    """Starts timing, with the function the run starts in
+
+    Args:
+        function_name (string): Name of the function running first
+        statements ([[string]]): The tokenized program
+    """
+    self.statements = statements
+    self.last = self.clock()
+    self.enter(function_name, self.last)
+
+  def stop(self):
+    # Leaves the functions still on the stack, after main ends or an error
+    now = self.clock()
+    while (self.stack):
+      self.leave(now)
+
+  def record(self, line_num, depth, tail_calls, scope):
+    """Charges the time since the last instruction to the instruction just executed
+
+    Calls and returns change the stack after the instruction, so the time
+    of a funccall is charged to the caller and that of a return to the
+    function returning. A tail call leaves the function it replaces.
+
+    Args:
+        line_num (int): Line of the instruction
+        depth (int): Number of frames before the instruction ran
+        tail_calls (int): Number of tail calls before the instruction ran
+        scope (ScopeManager): Holds the call stack after the instruction ran
+    """
+    frames = scope.frames
+    now = self.clock()
+    elapsed = now - self.last
+    self.last = now
+    node = self.stack[-1]
+    self.node_times[node] += elapsed
+    self.functions[self.node_names[node]][1] += elapsed
+    line = self.lines.get(line_num)
+    if (line is None):
+      self.lines[line_num] = [1, elapsed]
+    else:
+      line[0] += 1
+      line[1] += elapsed
+    if (len(frames) > depth):
+      self.enter(frames[-1].function.name, now)
+    elif (len(frames) < depth):
+      self.leave(now)
+    elif (scope.tail_calls != tail_calls):
+      self.leave(now)
+      self.enter(frames[-1].function.name, now)
+
+  def enter(self, function_name, now):
+    parent = self.stack[-1] if self.stack else -1
+    node = self.node_ids.get((parent, function_name))
+    if (node is None):
+      node = len(self.node_names)
+      self.node_ids[(parent, function_name)] = node
+      self.node_names.append(function_name)
+      self.node_parents.append(parent)
+      self.node_times.append(0.0)
+    self.stack.append(node)
+    self.entered.append(now)
+    function = self.functions.get(function_name)
+    if (function is None):
+      self.functions[function_name] = [1, 0.0, 0.0]
+    else:
+      function[0] += 1
+    self.active[function_name] = self.active.get(function_name, 0) + 1
+
+  def leave(self, now):
+    function_name = self.node_names[self.stack.pop()]
+    entered = self.entered.pop()
+    self.active[function_name] -= 1
+    # Only the outermost activation adds its time, so recursion is not counted twice
+    if (self.active[function_name] == 0):
+      self.functions[function_name][2] += now - entered
+
+  def collapsed(self):
+    """Gives the call stacks in the collapsed format read by flamegraph tools
+
+    Returns:
+        lines ([string]): Functions of a stack from the outermost, separated by ';', and its self time in microseconds
+    """
+    lines = []
+    for node in range(len(self.node_names)):
+      microseconds = round(self.node_times[node] * 1e6)
+      if (microseconds == 0):
+        continue
+      path = []
+      while (node != -1):
+        path.append(self.node_names[node])
+        node = self.node_parents[node]
+      lines.append(f'{";".join(reversed(path))} {microseconds}')
+    return lines
+
+  def write_collapsed(self, path):
+    """Writes the collapsed call stacks to a file, for flamegraph.pl or speedscope
+
+    Args:
+        path (string): Path of the file
+    """
+    with open(path, 'w') as handle:
+      for line in self.collapsed():
+        handle.write(line + '\n')
+
+  def report(self, limit=20):
+    """Formats the hottest functions and lines
+
+    Args:
+        limit (int): Number of lines listed, None for all of them
+
+    Returns:
+        report (string): Functions by inclusive time, then lines by time
+    """
+    total = sum(function[1] for function in self.functions.values()) or 1.0
+    rows = ['function                 calls     self s  inclusive s   self %']
+    for name, (calls, self_time, inclusive) in sorted(self.functions.items(), key=lambda item: -item[1][2]):
+      rows.append(f'{name:20}  {calls:8}  {self_time:9.4f}  {inclusive:11.4f}  {self_time / total:7.1%}')
+    rows.append('')
+    rows.append('line      count     time s   time %  statement')
+    lines = sorted(self.lines.items(), key=lambda item: -item[1][1])
+    for line_num, (count, elapsed) in lines[:limit]:
+      statement = ' '.join(self.statements[line_num]) if self.statements else ''
+      rows.append(f'{line_num:4}  {count:9}  {elapsed:9.4f}  {elapsed / total:7.1%}  {statement}')
+    return '\n'.join(rows)
+
+
+def main():
+  import argparse
+  # Imported here, the interpreter imports this module
+  from interpreterv3 import Interpreter
+
+  parser = argparse.ArgumentParser(description='Runs a Brewin program and reports where its time goes')
+  parser.add_argument('program', help='path of the program')
+  parser.add_argument('--collapsed', help='file to write collapsed call stacks to, for flamegraph tools')
+  parser.add_argument('--limit', type=int, default=20, help='number of lines listed')
+  arguments = parser.parse_args()
+
+  interpreter = Interpreter(profile=True)
+  try:
+    interpreter.run(arguments.program)
+  finally:
+    print(interpreter.profiler.report(arguments.limit))
+    if (arguments.collapsed):
+      interpreter.profiler.write_collapsed(arguments.collapsed)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,318 @@
+from intbase import InterpreterBase
+from intbase import ErrorType
+from tokenize import Tokenizer
+from func import FunctionManager
+from compiler import Compiler
+from cache import ProgramCache
+from source import program_lines, reiterable
+from memo import MemoCache
+from expression import ExpressionCompiler
+import operator
+import threading
+
+
+class Program:
+  # A program compiled once from its source, run by any number of interpreters
+
+  # Integer operators
+  INT_OPS = {
+      '+': operator.add,
+      '-': operator.sub,
+      '*': operator.mul,
+      '/': operator.floordiv,
+      '%': operator.mod,
+      '<': operator.lt,
+      '>': operator.gt,
+      '<=': operator.le,
+      '>=': operator.ge,
+      '!=': operator.ne,
+      '==': operator.eq,
+  }
+  # String Operators
+  STR_OPS = {
+      '+': operator.add,
+      '<': operator.lt,
+      '>': operator.gt,
+      '<=': operator.le,
+      '>=': operator.ge,
+      '!=': operator.ne,
+      '==': operator.eq,
+  }
+  # Bool Operators
+  BOOL_OPS = {
+      '!=': operator.ne,
+      '==': operator.eq,
+      '&': lambda a, b: a and b,
+      '|': lambda a, b: a or b,
+  }
+
+  def __init__(self, program=None, fold_constants=True, cache_dir=None, lazy_compile=False, memoize=False, fuse=True, static_types=True):
+    """Compiles a program
+
+    Nothing a run changes is kept here, so interpreters can run the same
+    program one after the other or at the same time in threads. Only lazy
+    compiling, the inline caches of call sites and the memo cache change
+    after loading, each of them safely when shared.
+
+    Args:
+        program: Path of the program file, or any iterable of its lines, None to load it later
+        fold_constants (bool): Whether constant sub-expressions are evaluated when compiling
+        cache_dir (string): Directory of the on-disk cache of tokenized programs, None for no cache
+        lazy_compile (bool): Whether functions are tokenized and compiled on their first call instead of up front
+        memoize: Whether results of pure functions are cached, or the MemoCache to cache them in, never shared with other programs
+        fuse (bool): Whether common statement sequences are fused into superinstructions
+        static_types (bool): Whether type checks proven to pass when compiling are skipped
+    """
+    self.tokenizer = Tokenizer()
+    self.functions = FunctionManager()
+    # Map of conditional branches and jumps
+    self.conditional_map = {}
+    # On-disk cache of tokenized programs, when a directory is given
+    self.cache = ProgramCache(cache_dir) if cache_dir is not None else None
+    # Whether functions are tokenized and compiled on their first call instead of up front
+    self.lazy_compile = lazy_compile
+    # Held while compiling a function lazily, runs in other threads may call it at the same time
+    self.compile_lock = threading.Lock()
+    # Source lines, kept to tokenize functions compiled lazily
+    self.source = None
+    # Caches the results of pure functions for every run of the program
+    if (memoize is True):
+      memoize = MemoCache()
+    self.memo = memoize if memoize else None
+    # Tokenized program code
+    self.program_code = []
+    self.total_lines = 0
+    # Pre-decoded instruction stream
+    self.instructions = []
+
+    # Compiles expressions into plans and the program into instructions
+    self.expressions = ExpressionCompiler(self.INT_OPS, self.STR_OPS, self.BOOL_OPS, fold_constants, static_types)
+    self.compiler = Compiler(self.expressions, fuse)
+
+    if (program is not None):
+      self.load(program)
+
+  def error(self, error_type, description=None, line_num=None):
+    # Raises a syntax error found while compiling, worded like InterpreterBase.error
+    description = ': ' + description if description else ''
+    if (line_num is None):
+      raise Exception(f'{error_type}{description}')
+    raise Exception(f'{error_type} on line {line_num}{description}')
+
+  # Reads the input and stores a tokenized version of the code
+  def load(self, program, error=None):
+    """Converts the list of statements to a tokenized version and lowers it to instructions
+
+    With a cache, the tokenized program, block maps and function table of a
+    program seen before are read back instead of scanning the program again.
+    In lazy mode only the functions are located, they are compiled when
+    first called and the cache is not used.
+
+    Files are read through a memory map, a line at a time, so the raw lines
+    are never held next to their tokens.
+
+    Args:
+        program: Path of the program file, or any iterable of its lines
+        error: Raises syntax errors, given the error type, description and line, Program.error by default
+    """
+    error = error or self.error
+    program = program_lines(program)
+    if (self.lazy_compile):
+      self.scan_functions(program)
+      return
+    if (self.cache is None):
+      self.scan_program(program, error)
+    else:
+      # The key is computed before scanning, iterators are stored so both can read the lines
+      program = reiterable(program)
+      key = self.cache.key(program)
+      entry = self.cache.load(key)
+      if (entry is None):
+        self.scan_program(program, error)
+        self.cache.store(key, (self.program_code, self.conditional_map, self.functions.export_functions()))
+      else:
+        self.program_code, self.conditional_map, functions = entry
+        self.total_lines = len(self.program_code)
+        self.functions.restore_functions(functions)
+
+    # Decode the program once into the instruction stream the run loop dispatches on
+    self.instructions = self.compiler.lower(self.program_code, self.conditional_map, self.functions)
+    self.memoize_pure_functions()
+
+  def scan_program(self, program, error):
+    """Tokenizes the program, matches its blocks and finds its functions
+
+    Args:
+        program: An iterable of the lines of the program
+        error: Raises syntax errors
+    """
+    tokenize = self.tokenizer.tokenize
+    for line in program:
+      # Removing leading and trailing whitespace
+      self.program_code.append(tokenize(line.strip()))
+
+    # Total number of lines on the program
+    self.total_lines = len(self.program_code)
+    self.match_blocks(0, self.total_lines, error)
+
+    # Set up function informations
+    self.functions.store_functions(self.program_code)
+
+  def scan_functions(self, program):
+    """Locates the functions of the program, tokenizing only their headers and ends
+
+    Args:
+        program: An iterable of the lines of the program
+    """
+    # Functions are tokenized from their lines when first called, so the lines are kept
+    self.source = program if isinstance(program, list) else list(program)
+    program = self.source
+    self.total_lines = len(program)
+    # Lines are tokenized when the function holding them is compiled, until then they read as blank
+    self.program_code = [[""]] * self.total_lines
+    tokenize = self.tokenizer.tokenize
+    for line_num in range(self.total_lines):
+      line = program[line_num].lstrip()
+      # Only lines starting with func or endfunc can be headers or ends, funccall never is
+      if (line.startswith((InterpreterBase.FUNC_DEF, InterpreterBase.ENDFUNC_DEF)) and
+          not line.startswith(InterpreterBase.FUNCCALL_DEF)):
+        statement = tokenize(line.strip())
+        if (statement[0] == InterpreterBase.FUNC_DEF or statement[0] == InterpreterBase.ENDFUNC_DEF):
+          self.program_code[line_num] = statement
+    self.functions.store_functions(self.program_code)
+
+  def match_blocks(self, start, stop, error):
+    """Maps the if, else and while statements between lines start and stop to the lines they jump to
+
+    Args:
+        start (int): First line
+        stop (int): Line after the last line
+        error: Raises syntax errors
+    """
+    if_stack = []
+    while_stack = []
+    for index in range(start, stop):
+      tokenized_line = self.program_code[index]
+      match tokenized_line[0]:
+
+        case InterpreterBase.IF_DEF:
+          if_stack.append([index])
+
+        case InterpreterBase.ELSE_DEF:
+          if (not if_stack):
+            error(ErrorType.SYNTAX_ERROR, "else without if", index)
+          if_stack[-1].append(index)
+
+        case InterpreterBase.ENDIF_DEF:
+          if (not if_stack):
+            error(ErrorType.SYNTAX_ERROR, "endif without if", index)
+          last_if = if_stack.pop()
+          last_if.append(index)
+          # Setting map from if to else and endif
+          if_line = last_if[0]
+          others = last_if[1:]
+          self.conditional_map[if_line] = others
+          # Setting map from else to endif
+          if (len(others) == 2):
+            self.conditional_map[others[0]] = [others[1]]
+
+        case InterpreterBase.WHILE_DEF:
+          while_stack.append(index)
+
+        case InterpreterBase.ENDWHILE_DEF:
+          if (not while_stack):
+            error(ErrorType.SYNTAX_ERROR, "endwhile without while", index)
+          last_while = while_stack.pop()
+          self.conditional_map[last_while] = index
+          self.conditional_map[index] = last_while
+
+  def get_call_target(self, function_name, error=None):
+    """Gives the CallTarget of a function, compiling the function on its first call in lazy mode
+
+    Args:
+        function_name (string): Name of the function
+        error: Raises syntax errors, Program.error by default
+
+    Returns:
+        target (CallTarget): Entry point and frame layout of the function
+    """
+    if (not self.functions.is_compiled(function_name)):
+      # Functions count as compiled once fully decoded, so only compiling needs the lock
+      with self.compile_lock:
+        if (not self.functions.is_compiled(function_name)):
+          self.compile_function(function_name, error or self.error)
+    return self.functions.get_call_target(function_name)
+
+  def compile_function(self, function_name, error):
+    """Tokenizes, validates and compiles a function with the lambdas it defines
+
+    Args:
+        function_name (string): Name of the function
+        error: Raises syntax errors
+    """
+    function = self.functions.get_function(function_name)
+    start = function.line_num
+    if (function.end_line is None):
+      error(ErrorType.SYNTAX_ERROR, f"Function {function_name} has no endfunc", start)
+    stop = function.end_line + 1
+
+    tokenize = self.tokenizer.tokenize
+    program_code = self.program_code
+    source = self.source
+    lambda_lines = []
+    for line_num in range(start, stop):
+      statement = tokenize(source[line_num].strip())
+      program_code[line_num] = statement
+      if (statement[0] == InterpreterBase.LAMBDA_DEF):
+        lambda_lines.append(line_num)
+    self.match_blocks(start, stop, error)
+    # Lambdas are only found now that the body is tokenized
+    if (lambda_lines):
+      self.functions.store_functions(program_code, start, stop)
+      for line_num in lambda_lines:
+        if (self.functions.find_endlambda(line_num) is None):
+          error(ErrorType.SYNTAX_ERROR, "Lambda has no endlambda", line_num)
+
+    self.compiler.lower_function(self.instructions, self.program_code, self.conditional_map, self.functions, function_name)
+    # Callers compiled earlier can become pure now that a function they call is compiled
+    self.memoize_pure_functions()
+
+  def compile_all(self, error=None):
+    """Compiles the functions not compiled yet, lambdas with the function defining them
+
+    Args:
+        error: Raises syntax errors, Program.error by default
+    """
+    for function_name, function in list(self.functions.function_defs.items()):
+      if (self.program_code[function.line_num][0] == InterpreterBase.FUNC_DEF):
+        self.get_call_target(function_name, error)
+
+  def memoize_pure_functions(self):
+    # Gives every pure function compiled so far the memo cache, its calls are then looked up first
+    if (self.memo is not None):
+      for function_name in self.functions.find_pure_functions():
+        self.functions.get_call_target(function_name).memo = self.memo
+
+  def get_memo_stats(self):
+    """Gives the counters of the memo cache
+
+    Returns:
+        stats (dict): Hits, misses and number of results cached, None when not memoizing
+    """
+    return None if self.memo is None else self.memo.stats()
+
+  def get_fusion_counts(self):
+    """Gives the number of superinstructions the program was compiled into
+
+    Returns:
+        counts (dict): Number of superinstructions of each kind
+    """
+    return dict(self.compiler.fusions)
+
+  def get_diagnostics(self):
+    """Gives the errors found while compiling, certain to happen if their line is reached
+
+    Returns:
+        diagnostics ([(ErrorType, int, string)]): Error type, line and description of each error
+    """
+    return self.expressions.diagnostics
@@ -0,0 +1,270 @@
+from scope import ScopeManager
+
+
+class Address:
+  # Where a name is found at run time
+
+  # A declared slot, always defined when the name is reached
+  LOCAL = 0
+  # A result slot of the function's top block, defined once a result is set
+  RESULT = 1
+  # Nothing declared, looked up by name among the frame bindings and functions
+  DYNAMIC = 2
+  # A reference parameter's slot, holding the Reference to the variable passed
+  REFERENCE = 3
+
+  __slots__ = ('kind', 'depth', 'slot')
+
+  def __init__(self, kind, depth=None, slot=None):
+    self.kind = kind
+    self.depth = depth
+    self.slot = slot
+
+
+class BlockScope:
+  # Names declared so far in one block of a function, while resolving
+
+  __slots__ = ('names', 'types', 'size', 'depth', 'parent', 'enclosing', 'inherited', 'origin', 'captured', 'captures',
+               'references')
+
+  def __init__(self, depth, parent=None, size=0, names=None, enclosing=None, inherited=None, origin=None, types=None):
+    # Map from declared name to slot
+    self.names = {} if names is None else names
+    # Map from declared name to the type it was declared with, None if the type is not valid
+    self.types = {} if types is None else types
+    # Number of slots of the block
+    self.size = size
+    self.depth = depth
+    self.parent = parent
+    # For the top block of a lambda, the names visible where it is defined
+    self.enclosing = enclosing
+    # For the top block of a lambda, the names declared in the block it is defined in
+    self.inherited = inherited
+    # For copies of the top block of a lambda, the block captures are added to
+    self.origin = origin
+    # Map from captured name to slot, and (depth, slot, captured slot) of each capture
+    self.captured = {}
+    self.captures = []
+    # For the top block, slots of the reference parameters
+    self.references = set()
+
+  def lookup(self, name):
+    # Find the innermost declaration of a name
+    scope = self
+    while True:
+      slot = scope.names.get(name)
+      if (slot is not None):
+        return scope.depth, slot
+      if (scope.parent is None):
+        return scope.capture(name)
+      scope = scope.parent
+
+  def type_of(self, name):
+    """Finds the declared type of the innermost declaration of a name
+
+    Variables are declared with a type and only ever hold values of it, and
+    captured copies have the type of the variable captured.
+
+    Args:
+        name (string): A variable name
+
+    Returns:
+        value_type (string): The declared type, None if the name is not declared
+    """
+    scope = self
+    while (scope.parent is not None and name not in scope.names):
+      scope = scope.parent
+    if (name in scope.names):
+      return scope.types.get(name)
+    top = scope.top()
+    if (top.enclosing is None):
+      return None
+    return top.enclosing.type_of(name)
+
+  def top(self):
+    # The top block captures are recorded in
+    return self if self.origin is None else self.origin
+
+  def capture(self, name):
+    """Captures a name visible where a lambda is defined into its top block
+
+    Args:
+        name (string): A variable name
+
+    Returns:
+        (int, int): Depth and slot of the captured copy, None if the name is not visible
+    """
+    top = self.top()
+    if (top.enclosing is None):
+      return None
+    slot = top.captured.get(name)
+    if (slot is None):
+      found = top.enclosing.lookup(name)
+      if (found is None):
+        return None
+      slot = top.size
+      top.size += 1
+      top.captured[name] = slot
+      top.captures.append((found[0], found[1], slot))
+    return 0, slot
+
+  def root(self):
+    # The top block of the chain
+    scope = self
+    while (scope.parent is not None):
+      scope = scope.parent
+    return scope
+
+  def capture_result(self, slot):
+    # Lambdas start with the results of the frame they are defined in
+    top = self.root().top()
+    if (top.enclosing is None or (0, slot, slot) in top.captures):
+      return
+    top.captures.append((0, slot, slot))
+    top.enclosing.capture_result(slot)
+
+  def resolve(self, name):
+    """Resolves a name to the address it is found at from this block
+
+    Args:
+        name (string): A variable name
+
+    Returns:
+        address (Address): Address of the name
+    """
+    found = self.lookup(name)
+    if (found is not None):
+      if (found[0] == 0 and found[1] in self.root().references):
+        return Address(Address.REFERENCE, 0, found[1])
+      return Address(Address.LOCAL, found[0], found[1])
+    if (name in ScopeManager.RESULT_NAMES):
+      self.capture_result(ScopeManager.RESULT_NAMES[name])
+      return Address(Address.RESULT, 0, ScopeManager.RESULT_NAMES[name])
+    return Address(Address.DYNAMIC)
+
+  def resolve_operand(self, name):
+    """Resolves a variable or an object member
+
+    Args:
+        name (string): A variable name or an object.member name
+
+    Returns:
+        (Address, string): Address of the variable or object, and the member name or None
+    """
+    address = self.resolve(name)
+    if (address.kind != Address.DYNAMIC or '.' not in name):
+      return address, None
+    parts = name.split('.')
+    return self.resolve(parts[0]), parts[1]
+
+  def declare(self, name, value_type=None):
+    """Declares a name in this block
+
+    Args:
+        name (string): A variable name
+        value_type (string): Type the variable is declared with, None if it is not valid
+
+    Returns:
+        slot (int): Slot of the variable in the block
+    """
+    # Results always live in their reserved slots of the top block
+    if (self.depth == 0 and name in ScopeManager.RESULT_NAMES):
+      return ScopeManager.RESULT_NAMES[name]
+    slot = self.names.get(name)
+    if (slot is None):
+      slot = self.size
+      self.size += 1
+      self.names[name] = slot
+      # Declaring a name again fails when run, so the variable keeps its first type
+      self.types[name] = value_type
+    return slot
+
+  def declare_reference(self, name, value_type=None):
+    """Declares a reference parameter in the top block
+
+    Args:
+        name (string): A parameter name
+        value_type (string): Type of the parameter
+
+    Returns:
+        slot (int): Slot of the parameter
+    """
+    slot = self.declare(name, value_type)
+    self.references.add(slot)
+    return slot
+
+  def is_declared(self, name):
+    # Lambdas share the block they are defined in, so its names count as declared
+    return name in self.names or (self.inherited is not None and name in self.inherited)
+
+  def snapshot(self):
+    """Copies the names visible from this block, as they are at this point
+
+    Returns:
+        scope (BlockScope): A copy of the chain of blocks
+    """
+    if (self.parent is not None):
+      return BlockScope(self.depth, self.parent.snapshot(), self.size, dict(self.names), types=dict(self.types))
+    return BlockScope(self.depth, None, self.size, dict(self.names), origin=self.top(), types=dict(self.types))
+
+  def visible(self):
+    """Flattens the chain of blocks into the addresses of all visible names
+
+    For lambdas, every name visible where the lambda is defined is captured.
+
+    Returns:
+        names (dict): Map from name to (depth, slot)
+    """
+    if (self.parent is not None):
+      names = self.parent.visible()
+    else:
+      names = {}
+      top = self.top()
+      if (top.enclosing is not None):
+        for name in top.enclosing.visible():
+          names[name] = self.capture(name)
+    for name in self.names:
+      names[name] = (self.depth, self.names[name])
+    return names
+
+
+class Resolver:
+  # Creates the scopes used to map variable occurrences to frame slots
+
+  def function_scope(self):
+    """Creates the top block of a function
+
+    Returns:
+        scope (BlockScope): Top block, with the result slots reserved
+    """
+    return BlockScope(0, size=ScopeManager.RESULT_SIZE)
+
+  def block_scope(self, scope, declares=True):
+    """Opens a nested block for an if, else or while body
+
+    Blocks declaring no variables are never allocated at run time, they
+    share the depth of the enclosing block.
+
+    Args:
+        scope (BlockScope): The enclosing block
+        declares (bool): Whether the body holds a var statement of its own
+
+    Returns:
+        scope (BlockScope): The nested block
+    """
+    return BlockScope(scope.depth + 1 if declares else scope.depth, scope)
+
+  def lambda_scope(self, snapshot):
+    """Creates the top block of a lambda
+
+    A lambda runs in a frame of its own. Names it uses from where it is
+    defined are captured by value into slots of its top block when the
+    lambda is created, so only the variables the lambda touches are copied.
+
+    Args:
+        snapshot (BlockScope): Names visible where the lambda is defined
+
+    Returns:
+        scope (BlockScope): Top block of the lambda, with the result slots reserved
+    """
+    return BlockScope(0, size=ScopeManager.RESULT_SIZE, enclosing=snapshot, inherited=snapshot.names)
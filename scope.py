@@ -1,141 +1,240 @@
 from intbase import InterpreterBase, ErrorType
-
-class ScopeManager:
-  def __init__(self):
-    self.function_scopes = []
-    # self.lambda_scopes = []
-    # self.reference_variables_stack = []
+import copy
 
 
+class Frame:
+  # One function activation: where it returns to, what it runs and its locals
 
-  # Find the scope number of a varaible in a given function scope
-  def find_scope_num(self, variable_name, function_scope_stack_index = -1):
-    function_scope_stack = self.function_scopes[function_scope_stack_index]
-    for index in reversed(range(len(function_scope_stack))):
-      if(variable_name in function_scope_stack[index]):
-        return index
-    return -1 
+  __slots__ = ('function', 'return_address', 'caller_variable', 'blocks', 'bindings', 'memo_key')
 
+  def __init__(self):
+    # CallTarget of the function running in the frame
+    self.function = None
+    # Instruction index to continue at once the function returns
+    self.return_address = None
+    # Name the function was called through, the object of a method call is its prefix
+    self.caller_variable = None
+    # One list of slots per open block, indexed by block depth
+    self.blocks = []
+    # Names bound by the caller instead of declared, the object of a method call
+    self.bindings = None
+    # Key the result is cached under when the function returns, None if it is not memoized
+    self.memo_key = None
+
+
+class Reference:
+  # A variable passed by reference, pointing at the slot that holds its value
+
+  __slots__ = ('block', 'slot')
+
+  def __init__(self, block, slot):
+    # Block of slots the variable lives in, shared with the frame that declared it
+    self.block = block
+    self.slot = slot
+
+  def get(self):
+    return self.block[self.slot]
+
+  def set(self, value_type):
+    self.block[self.slot] = value_type
+
+
+class Closure:
+  # Variables a lambda captured by value when it was created
+
+  __slots__ = ('captures', 'values', 'bindings', 'mutable')
+
+  def __init__(self, captures, values, bindings, mutable):
+    # (depth, slot, captured slot) of each captured variable
+    self.captures = captures
+    # Captured value_types, in the order of captures
+    self.values = values
+    self.bindings = bindings
+    # Whether an object was captured, objects are copied again for each invocation
+    self.mutable = mutable
+
+  def open(self, frame_size):
+    """Creates the top block of an invocation, holding a copy of the captured variables
+
+    Args:
+        frame_size (int): Number of slots of the lambda's top block
+
+    Returns:
+        (list, dict): The top block and the bindings of the lambda's frame
+    """
+    values = self.values
+    bindings = self.bindings
+    if (self.mutable):
+      values, bindings = copy.deepcopy((values, bindings))
+    top = [None] * frame_size
+    captures = self.captures
+    for index in range(len(captures)):
+      top[captures[index][2]] = values[index]
+    return top, bindings
 
-  # Add a variable to the local scope of the current function scope
-  def add_to_local_scope(self,variable_name,value_type,function_scope_stack_index=-1):
-    function_scope_stack = self.function_scopes[function_scope_stack_index]
-    function_scope_stack[-1][variable_name] = value_type
 
+class ScopeManager:
+  # Slots of the result variables at the start of every function's top block
+  RESULT_SLOTS = {
+    InterpreterBase.STRING_DEF: 0,
+    InterpreterBase.INT_DEF: 1,
+    InterpreterBase.BOOL_DEF: 2,
+    InterpreterBase.FUNC_DEF: 3,
+    InterpreterBase.OBJECT_DEF: 4,
+  }
+  RESULT_NAMES = {
+    "results": 0,
+    "resulti": 1,
+    "resultb": 2,
+    "resultf": 3,
+    "resulto": 4,
+  }
+  RESULT_SIZE = 5
 
-  # Check if a variable is in the local scope
-  def check_in_local_scope(self,variable_name):
-    function_scope_stack = self.function_scopes[-1]
-    if(variable_name in function_scope_stack[-1]):
-      return True
-    else:
-      return False
- 
-  def check_in_function_scope(self,variable_name,function_scope_stack_index=-1):
-    function_scope_stack = self.function_scopes[function_scope_stack_index]
-    for scope in function_scope_stack:
-      if(variable_name in scope):
-        return True
-    return False
-
-
-  # Get a varaible value_type given scope_index and variable_name
-  def get_variable(self,scope_index,name):
-    function_scope_stack = self.function_scopes[-1]
-    if('.' in  name):
-      object_name = name.split('.')[0]
-      object_variable = name.split('.')[1]
-      if( object_variable in function_scope_stack[scope_index][object_name][0]):
-        return function_scope_stack[scope_index][object_name][0][object_variable]
-      else:
-        return None
-    return function_scope_stack[scope_index][name]
-
-  # Set a variable valu_type given scope_index and variable_na
-  def set_variable(self,scope_index,name,result):
-    # If result has reference, we still want to assign by value
-    value = result[0]
-    vtype = result[1]
-    result = (value,vtype)
-
-    function_scope_stack = self.function_scopes[-1]
-    if('.' in  name):
-      object_name = name.split('.')[0]
-      object_variable = name.split('.')[1]
-      function_scope_stack[scope_index][object_name][0][object_variable] = result
+  def __init__(self):
+    # Call stack, one Frame per function activation
+    self.frames = []
+    # Frame on top of the stack and its blocks
+    self.frame = None
+    self.blocks = None
+    # Frames of returned calls, reused by later calls
+    self.free_frames = []
+    # Deepest the call stack has been
+    self.peak_depth = 0
+    # Calls that reused the frame of the function calling them
+    self.tail_calls = 0
+
+  def reset(self):
+    # Releases the frames left by a run that ended, keeping them pooled for the next run
+    while (self.frames):
+      self.pop_frame()
+    self.peak_depth = 0
+    self.tail_calls = 0
+
+  def push_frame(self, function, return_address, caller_variable, top, bindings=None):
+    """Pushes the frame of a call, reusing a frame of a returned call if there is one
+
+    Args:
+        function (CallTarget): The function called
+        return_address (int): Instruction index to continue at once the function returns
+        caller_variable (string): Name the function was called through
+        top ([value_type]): Top block of the function, with the parameters set
+        bindings (dict): Names bound by the caller, None if there are none
+    """
+    frame = self.free_frames.pop() if self.free_frames else Frame()
+    frame.function = function
+    frame.return_address = return_address
+    frame.caller_variable = caller_variable
+    frame.blocks.append(top)
+    frame.bindings = bindings
+    self.frames.append(frame)
+    self.frame = frame
+    self.blocks = frame.blocks
+    if (len(self.frames) > self.peak_depth):
+      self.peak_depth = len(self.frames)
+
+  def replace_frame(self, function, caller_variable, top, bindings=None):
+    """Reuses the frame on top of the stack for a call in tail position
+
+    The function called returns straight to the caller of the function
+    the frame belonged to, so the stack does not grow.
+
+    Args:
+        function (CallTarget): The function called
+        caller_variable (string): Name the function was called through
+        top ([value_type]): Top block of the function, with the parameters set
+        bindings (dict): Names bound by the caller, None if there are none
+    """
+    frame = self.frame
+    frame.function = function
+    frame.caller_variable = caller_variable
+    frame.blocks.clear()
+    frame.blocks.append(top)
+    frame.bindings = bindings
+    self.tail_calls += 1
+
+  def pop_frame(self):
+    """Pops the frame of the function returning and releases it to the pool
+
+    Returns:
+        return_address (int): Instruction index to continue at
+    """
+    frame = self.frames.pop()
+    if (self.frames):
+      self.frame = self.frames[-1]
+      self.blocks = self.frame.blocks
     else:
-      if(len(function_scope_stack[scope_index][name]) == 3):
-        reference = function_scope_stack[scope_index][name][2]
-        result = result + (reference,)
-      function_scope_stack[scope_index][name] = result
-  
-
-
-  def add_new_scope(self):
-    self.function_scopes[-1].append({})
+      self.frame = None
+      self.blocks = None
+    return_address = frame.return_address
+    # Drop what the frame refers to, so that pooled frames keep nothing alive
+    frame.function = None
+    frame.caller_variable = None
+    frame.blocks.clear()
+    frame.bindings = None
+    frame.memo_key = None
+    self.free_frames.append(frame)
+    return return_address
+
+  # Set a variable value_type given its address
+  def set_variable(self,depth,slot,result):
+    self.blocks[depth][slot] = (result[0],result[1])
+
+  # Get the Reference to pass a variable by reference given its address, None if it is not defined
+  def get_reference(self,depth,slot):
+    current = self.blocks[depth][slot]
+    if(current is None):
+      return None
+    # Passing on a reference parameter refers to the original variable
+    if(type(current) is Reference):
+      return current
+    return Reference(self.blocks[depth],slot)
+
+  def capture(self,captures):
+    """Copies the variables a lambda uses out of the current frame
+
+    Ints, strings, bools and functions are never changed in place, so only
+    objects and the object of a method call need a deep copy.
+
+    Args:
+        captures ([(int, int, int)]): (depth, slot, captured slot) of each captured variable
+
+    Returns:
+        closure (Closure): The captured variables
+    """
+    blocks = self.blocks
+    bindings = self.frame.bindings
+    mutable = bindings is not None
+    values = []
+    for depth, slot, _ in captures:
+      value_type = blocks[depth][slot]
+      # Captured by value, references are not kept
+      if(type(value_type) is Reference):
+        value_type = value_type.get()
+      if(value_type is not None):
+        if(value_type[1] == InterpreterBase.OBJECT_DEF):
+          mutable = True
+      values.append(value_type)
+    if(mutable):
+      values, bindings = copy.deepcopy((values, bindings))
+    return Closure(captures, values, bindings, mutable)
+
+  def get_binding(self,name):
+    bindings = self.frame.bindings
+    if(bindings is not None):
+      return bindings.get(name)
+    return None
+
+  def set_binding(self,name,result):
+    self.frame.bindings[name] = (result[0],result[1])
+
+  def add_new_scope(self,size):
+    self.blocks.append([None] * size)
 
   def delete_current_scope(self):
-    self.function_scopes[-1].pop()
+    self.blocks.pop()
 
   def set_result(self,index,value_type):
-    previous_function_scope_stack = self.function_scopes[index]
-    top_scope = previous_function_scope_stack[0]
-    value = value_type[0]
-    vtype = value_type[1]
-    match vtype:
-      case InterpreterBase.STRING_DEF:
-        top_scope["results"] = (value,vtype)
-      case InterpreterBase.INT_DEF:
-        top_scope["resulti"] = (value,vtype)
-      case InterpreterBase.BOOL_DEF:
-        top_scope["resultb"] = (value,vtype)
-      case InterpreterBase.FUNC_DEF:
-        top_scope["resultf"] = (value,vtype)
-      case InterpreterBase.OBJECT_DEF:
-        top_scope["resulto"] = (value,vtype)
-
-  def set_referenced(self,variable_name,function_scope_stack_index=-1):
-    current_function_scope_stack = self.function_scopes[function_scope_stack_index]
-    index = self.find_scope_num(variable_name)
-    scope = current_function_scope_stack[index]
-    value_type = scope[variable_name]
-    if(len(value_type) == 3):
-      value = value_type[0]
-      vtype = value_type[1]
-      referenced_name = value_type[2]
-      
-      previous_function_scope_stack = self.function_scopes[function_scope_stack_index-1]
-      var_scope_index = self.find_scope_num(referenced_name,function_scope_stack_index-1)
-      var_scope = previous_function_scope_stack[var_scope_index]
-      
-      if(len(var_scope[referenced_name]) == 3):
-        reference = var_scope[referenced_name][2]
-        var_scope[referenced_name] = (value,vtype,reference)
-        # Recursively update all referenced variables
-        self.set_referenced(referenced_name,function_scope_stack_index-1)
-      else:
-        var_scope[referenced_name] = (value,vtype)
-
-      # Update all reference variables in the current stack
-      self.update_from_referenced(function_scope_stack_index)
-          
-  
-  def update_from_referenced(self,function_scope_stack_index=-1):
-    current_function_scope_stack = self.function_scopes[function_scope_stack_index]
-    for scope in current_function_scope_stack:
-      for variable in scope:
-        value_type = scope[variable]
-        if(len(value_type) == 3):
-          # Scope of referenced variable
-          previous_function_scope_stack = self.function_scopes[function_scope_stack_index-1]
-          referenced_name = value_type[2]
-          var_scope_index = self.find_scope_num(referenced_name,function_scope_stack_index-1)
-          var_scope = previous_function_scope_stack[var_scope_index]
-          
-          referenced_value = var_scope[referenced_name][0]
-          referenced_type = var_scope[referenced_name][1]
-
-          scope[variable] = (referenced_value,referenced_type,referenced_name)
-
-     
-    
\ No newline at end of file
+    slot = self.RESULT_SLOTS.get(value_type[1])
+    if(slot is not None):
+      self.frames[index].blocks[0][slot] = (value_type[0],value_type[1])
@@ -0,0 +1,51 @@
+import mmap
+import os
+
+
+class MappedSource:
+  # Lines of a program file, read through a memory map every time they are iterated
+
+  def __init__(self, path):
+    self.path = path
+
+  def __iter__(self):
+    """Reads the file a line at a time, so only the line being tokenized is held as a string
+
+    Yields:
+        line (string): A line, with its line break
+    """
+    with open(self.path, 'rb') as handle:
+      # Empty files cannot be mapped
+      if (os.fstat(handle.fileno()).st_size == 0):
+        return
+      with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        for line in iter(mapped.readline, b''):
+          yield line.decode()
+
+
+def program_lines(program):
+  """Gives the lines of a program
+
+  Args:
+      program: Path of the program file, or any iterable of its lines
+
+  Returns:
+      lines: An iterable of the lines, a MappedSource for paths
+  """
+  if (isinstance(program, (str, os.PathLike))):
+    return MappedSource(program)
+  return program
+
+
+def reiterable(lines):
+  """Makes sure the lines can be iterated more than once
+
+  Args:
+      lines: An iterable of lines
+
+  Returns:
+      lines: The lines, stored in a list if they were a one-shot iterator
+  """
+  if (iter(lines) is lines):
+    return list(lines)
+  return lines
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the interpreter modules from the top of the repository, like the benchmarks
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
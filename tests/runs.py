@@ -0,0 +1,22 @@
+from interpreterv3 import Interpreter
+
+
+def outcome(program, input=None, **options):
+  """Runs a program, catching the error it fails with
+
+  Args:
+      program ([string]): The program
+      input ([string]): Its input lines
+      options: Options of the interpreter, such as fuse or memoize
+
+  Returns:
+      (output, error): Lines printed, and the error type and line, (None, None) for runs that end well
+  """
+  interpreter = Interpreter(console_output=False, input=input, **options)
+  try:
+    interpreter.run(program)
+  except Exception:
+    # Crashes of the interpreter are not errors of the program
+    if (interpreter.error_type is None):
+      raise
+  return interpreter.get_output(), interpreter.get_error_type_and_line()
@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import os
+
+import pytest
+
+import batch
+
+
+def write_manifest(tmp_path, programs):
+  """Writes a program file per job and a manifest naming them
+
+  Args:
+      programs (dict): Lines of each program, by name
+
+  Returns:
+      path (string): Path of the manifest
+  """
+  manifest = tmp_path / 'jobs.jsonl'
+  with open(manifest, 'w') as handle:
+    for name, program in programs.items():
+      (tmp_path / name).write_text('\n'.join(program) + '\n')
+      handle.write(json.dumps({'program': name}) + '\n')
+  return str(manifest)
+
+
+def printing(text):
+  return ['func main void', f'  funccall print "{text}"', 'endfunc']
+
+
+def test_batches_run_every_job(tmp_path):
+  jobs = batch.load_manifest(write_manifest(tmp_path, {f'job{index}.src': printing(index) for index in range(6)}))
+  results = list(batch.run_batch(jobs, workers=2, chunk_size=2))
+  assert sorted(result['index'] for result in results) == list(range(6))
+  assert all(result['status'] == 'pass' for result in results)
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='workers see the patched run_job when forked')
+def test_jobs_killing_their_worker_are_reported_as_crashes(tmp_path, monkeypatch):
+  run_job = batch.run_job
+  def dying(job, timeout=None):
+    if (job['name'] == 'die.src'):
+      os._exit(1)
+    return run_job(job, timeout)
+  monkeypatch.setattr(batch, 'run_job', dying)
+  programs = {f'job{index}.src': printing(index) for index in range(4)}
+  programs['die.src'] = printing('never')
+  jobs = batch.load_manifest(write_manifest(tmp_path, programs))
+  results = {result['name']: result for result in batch.run_batch(jobs, workers=2)}
+  assert sorted(results) == sorted(programs)
+  assert results['die.src']['status'] == 'crash'
+  assert all(results[name]['status'] == 'pass' for name in programs if name != 'die.src')
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='workers see the patched run_job when forked')
+def test_pools_breaking_before_every_job_is_submitted_go_on(tmp_path, monkeypatch):
+  run_job = batch.run_job
+  def dying(job, timeout=None):
+    if (job['name'] == 'die.src'):
+      os._exit(1)
+    return run_job(job, timeout)
+  monkeypatch.setattr(batch, 'run_job', dying)
+  # The pool takes two chunks per worker up front, the dying job is among them and many wait behind it
+  programs = {'die.src': printing('never')}
+  programs.update({f'job{index}.src': printing(index) for index in range(40)})
+  jobs = batch.load_manifest(write_manifest(tmp_path, programs))
+  runs = []
+  original = batch.run_pool
+  def counting(chunks, workers, context, lost, suspects):
+    runs.append((len(chunks), workers))
+    return original(chunks, workers, context, lost, suspects)
+  monkeypatch.setattr(batch, 'run_pool', counting)
+  results = {result['name']: result for result in batch.run_batch(jobs, workers=2)}
+  assert sorted(results) == sorted(programs)
+  assert results['die.src']['status'] == 'crash'
+  assert all(results[name]['status'] == 'pass' for name in programs if name != 'die.src')
+  # Only the jobs running when the pool broke run alone, the rest go on with every worker
+  assert sum(1 for chunks, workers in runs if workers == 1) <= 2
+  assert runs[1:] and all(workers == 2 for chunks, workers in runs if chunks > 1)
@@ -0,0 +1,39 @@
+import importlib.util
+import json
+import os
+import sys
+
+# After the top of the repository, so the interpreter's modules come before the scripts named like them
+BENCHMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks')
+sys.path.append(BENCHMARKS)
+import suite
+
+
+def test_suite_runs_every_program_of_the_corpus(tmp_path):
+  output = tmp_path / 'report.json'
+  report = suite.main(['--scale', '0.01', '--warmup', '0', '--repeat', '1', '--output', str(output)])
+  assert json.loads(output.read_text()) == report
+  assert sorted(report['benchmarks']) == sorted(suite.corpus(0.01))
+  for name, result in report['benchmarks'].items():
+    assert result['statements'] > 0, name
+
+
+def test_options_keep_the_output_of_every_program():
+  names = ['blocks', 'fusion', 'arithmetic', 'fib', 'tailcalls', 'sparse']
+  arguments = ['--scale', '0.01', '--warmup', '0', '--repeat', '1', '--output', os.devnull] + names
+  plain = suite.main(arguments)
+  changed = suite.main(arguments + ['--option', 'fuse=false', '--option', 'memoize=true',
+                                    '--option', 'lazy_compile=true', '--option', 'static_types=false'])
+  assert changed['options'] == {'fuse': False, 'memoize': True, 'lazy_compile': True, 'static_types': False}
+  for name in names:
+    assert changed['benchmarks'][name]['output_sha256'] == plain['benchmarks'][name]['output_sha256'], name
+
+
+def test_scripts_import():
+  # Loaded from their files, cache.py is also the name of a module of the interpreter
+  for script in ('cache', 'frontend', 'functions', 'input', 'references'):
+    path = os.path.join(BENCHMARKS, script + '.py')
+    spec = importlib.util.spec_from_file_location(f'benchmark_{script}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert callable(module.main)
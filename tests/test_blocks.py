@@ -0,0 +1,84 @@
+from intbase import ErrorType
+from runs import outcome
+
+# Bodies of if, else and while declaring nothing, around bodies that declare, shadow and capture
+PROGRAM = [
+  'func main void',
+  '  var int i x',
+  '  var func f',
+  '  assign x 1',
+  '  while < i 3',
+  '    if == i 1',
+  '      assign x + x 10',
+  '      if True',
+  '        var int x',
+  '        assign x 100',
+  '        funccall print "inner " x',
+  '      endif',
+  '      lambda y:int int',
+  '        return + x y',
+  '      endlambda',
+  '      assign f resultf',
+  '    else',
+  '      funccall print "i " i " x " x',
+  '    endif',
+  '    assign i + i 1',
+  '  endwhile',
+  '  funccall f 5',
+  '  funccall print resulti',
+  '  if True',
+  '    var int i',
+  '    assign i 7',
+  '    funccall print "shadow " i',
+  '  endif',
+  '  funccall print "i " i',
+  '  while < i 5',
+  '    var int x',
+  '    assign i + i 1',
+  '  endwhile',
+  '  if True',
+  '    funccall print "before"',
+  '    var int i',
+  '    var int i',
+  '  endif',
+  'endfunc',
+]
+
+OUTPUT = ['i 0 x 1', 'inner 100', 'i 2 x 11', '16', 'shadow 7', 'i 3', 'before']
+
+
+def declaring_everywhere(program):
+  # The program with a variable declared in every body, so each one has a block of its own
+  declaring = []
+  for index, statement in enumerate(program):
+    declaring.append(statement)
+    keyword = statement.split()[0]
+    following = program[index + 1].split()[0] if index + 1 < len(program) else ''
+    if (keyword in ('if', 'else', 'while') and following != 'var'):
+      declaring.append(' ' * (len(statement) - len(statement.lstrip()) + 2) + 'var bool unused')
+  return declaring
+
+
+def test_bodies_without_blocks_run_like_bodies_with_them():
+  assert outcome(PROGRAM) == (OUTPUT, (ErrorType.NAME_ERROR, 36))
+  output, (error_type, line) = outcome(declaring_everywhere(PROGRAM))
+  assert (output, error_type) == (OUTPUT, ErrorType.NAME_ERROR)
+  assert declaring_everywhere(PROGRAM)[line] == '    var int i'
+
+
+def test_variables_of_ended_blocks_are_gone():
+  program = [
+    'func main void',
+    '  var int n',
+    '  while < n 2',
+    '    if True',
+    '      var int z',
+    '      assign z + n 1',
+    '    endif',
+    '    assign n + n 1',
+    '  endwhile',
+    '  funccall print z',
+    'endfunc',
+  ]
+  assert outcome(program) == ([], (ErrorType.NAME_ERROR, 9))
+  assert outcome(declaring_everywhere(program))[1][0] == ErrorType.NAME_ERROR
@@ -0,0 +1,37 @@
+import os
+import threading
+
+from cache import ProgramCache
+from interpreterv3 import Interpreter
+
+PROGRAM = [
+  'func main void',
+  '  funccall print "cached"',
+  'endfunc',
+]
+
+
+def test_keys_tell_lines_holding_line_breaks_apart(tmp_path):
+  cache = ProgramCache(str(tmp_path))
+  assert cache.key(['func main void\n', 'endfunc\r\n']) == cache.key(['func main void', 'endfunc'])
+  assert cache.key(['func main void\nendfunc']) != cache.key(['func main void', 'endfunc'])
+
+
+def test_threads_storing_the_same_key_leave_one_entry(tmp_path):
+  cache = ProgramCache(str(tmp_path))
+  key = cache.key(PROGRAM)
+  entry = (list(range(10000)), {'main': 0})
+  threads = [threading.Thread(target=cache.store, args=(key, entry)) for _ in range(8)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert os.listdir(tmp_path) == [key + '.brewin']
+  assert cache.load(key) == entry
+
+
+def test_cached_programs_run_like_compiled_ones(tmp_path):
+  for _ in range(2):
+    interpreter = Interpreter(console_output=False, cache_dir=str(tmp_path))
+    interpreter.run(PROGRAM)
+    assert interpreter.get_output() == ['cached']
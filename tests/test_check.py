@@ -0,0 +1,33 @@
+import pytest
+
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+
+
+def test_check_reports_syntax_errors():
+  interpreter = Interpreter(console_output=False)
+  diagnostics = interpreter.check(['func main void', '  endwhile', 'endfunc'])
+  assert [diagnostic[:2] for diagnostic in diagnostics] == [(ErrorType.SYNTAX_ERROR, 1)]
+
+
+def test_check_ignores_errors_of_an_earlier_run():
+  interpreter = Interpreter(console_output=False)
+  with pytest.raises(Exception):
+    interpreter.run(['func main void', '  var int x', '  assign x "s"', 'endfunc'])
+  assert interpreter.get_error_type_and_line() == (ErrorType.TYPE_ERROR, 2)
+  assert interpreter.check(['func main void', '  var int x', '  assign x 1', 'endfunc']) == []
+  assert interpreter.get_error_type_and_line() == (None, None)
+
+
+def test_check_raises_crashes_after_a_failed_run():
+  # A malformed program crashes the compiler, which is not a diagnostic even once a run has failed
+  fresh = Interpreter(console_output=False)
+  with pytest.raises(Exception) as crash:
+    fresh.check(['func f x int'])
+  assert fresh.get_error_type_and_line() == (None, None)
+
+  interpreter = Interpreter(console_output=False)
+  with pytest.raises(Exception):
+    interpreter.run(['func main void', '  var int x', '  assign x "s"', 'endfunc'])
+  with pytest.raises(type(crash.value)):
+    interpreter.check(['func f x int'])
@@ -0,0 +1,65 @@
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+from runs import outcome
+
+# Counts, stores results, reads input and branches on variables, each fused when fuse is on
+FUSED_PROGRAM = [
+  'func main void',
+  '  var int i total n',
+  '  var bool go odd',
+  '  var string s',
+  '  assign go True',
+  '  while go',
+  '    funccall input "number"',
+  '    funccall strtoint results',
+  '    assign n resulti',
+  '    assign total + total n',
+  '    assign odd == % i 2 1',
+  '    if odd',
+  '      funccall print "odd " i',
+  '    endif',
+  '    assign i + 1 i',
+  '    assign go < i 4',
+  '  endwhile',
+  '  funccall print total',
+  'endfunc',
+]
+
+
+def failing(line, statement):
+  # The program with a statement replaced, placing an error on that line
+  program = list(FUSED_PROGRAM)
+  program[line] = statement
+  return program
+
+
+def test_fusion_happens():
+  interpreter = Interpreter(console_output=False, input=['1', '2', '3', '4'])
+  interpreter.run(FUSED_PROGRAM)
+  counts = interpreter.get_fusion_counts()
+  assert all(counts.get(kind) for kind in ('increment', 'store_result', 'call_store', 'if_var', 'while_var')), counts
+
+
+def test_fused_runs_print_like_unfused_ones():
+  inputs = ['1', '2', '3', '4']
+  expected = (['number', 'number', 'odd 1', 'number', 'number', 'odd 3', '10'], (None, None))
+  assert outcome(FUSED_PROGRAM, inputs, fuse=False) == expected
+  assert outcome(FUSED_PROGRAM, inputs) == expected
+
+
+def test_fused_statements_fail_on_their_own_lines():
+  inputs = ['1', '2', '3', '4']
+  cases = [
+    (failing(14, '    assign s + s 1'), ['number']),
+    (failing(8, '    assign s resulti'), ['number']),
+    (failing(7, '    funccall strtoint i'), ['number']),
+    (failing(11, '    if s'), ['number']),
+    (failing(5, '  while s'), []),
+  ]
+  for program, output in cases:
+    line = next(index for index, statement in enumerate(program) if statement != FUSED_PROGRAM[index])
+    expected = (output, (ErrorType.TYPE_ERROR, line))
+    # Without static types the errors are found by the superinstructions themselves
+    for static_types in (True, False):
+      assert outcome(program, inputs, fuse=False, static_types=static_types) == expected
+      assert outcome(program, inputs, static_types=static_types) == expected
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+
+from interpreterv3 import Interpreter
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+READ_ONE = [
+  'func main void',
+  '  funccall input "?"',
+  '  funccall print "got " results',
+  'endfunc',
+]
+
+
+def run_piped(script, text):
+  """Runs a Python script with text piped to its stdin
+
+  Args:
+      script (string): Source of the script, run from the top of the repository
+      text (string): What is piped in
+
+  Returns:
+      lines ([string]): What the script wrote to stdout
+  """
+  completed = subprocess.run([sys.executable, '-c', script], input=text.encode(), cwd=ROOT,
+                             stdout=subprocess.PIPE, check=True)
+  return completed.stdout.decode().splitlines()
+
+
+def test_runs_in_a_row_share_piped_stdin():
+  script = ('from interpreterv3 import Interpreter\n'
+            f'program = {READ_ONE!r}\n'
+            'interpreter = Interpreter()\n'
+            'interpreter.run(program)\n'
+            'interpreter.run(program)\n')
+  assert run_piped(script, 'a\nb\nc\n') == ['?', 'got a', '?', 'got b']
+
+
+def test_interpreters_in_a_row_share_piped_stdin():
+  script = ('from interpreterv3 import Interpreter\n'
+            f'program = {READ_ONE!r}\n'
+            'Interpreter().run(program)\n'
+            'Interpreter().run(program)\n')
+  assert run_piped(script, 'a\nb\nc\n') == ['?', 'got a', '?', 'got b']
+
+
+def test_file_input_goes_on_across_runs(tmp_path):
+  path = tmp_path / 'input.txt'
+  path.write_text('a\nb\n')
+  with open(path) as handle:
+    interpreter = Interpreter(console_output=False, input=handle)
+    interpreter.run(READ_ONE)
+    interpreter.run(READ_ONE)
+    assert interpreter.get_output() == ['?', 'got b']
+    interpreter.run(READ_ONE)
+    assert interpreter.get_output() == ['?', 'got None']
+
+
+def test_list_input_starts_over_every_run():
+  interpreter = Interpreter(console_output=False, input=['a', 'b'])
+  interpreter.run(READ_ONE)
+  interpreter.run(READ_ONE)
+  assert interpreter.get_output() == ['?', 'got a']
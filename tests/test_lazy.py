@@ -0,0 +1,99 @@
+import os
+
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+from runs import outcome
+
+PROGRAM = [
+  'func helper x:int int',
+  '  var int y',
+  '  assign y + x "s"',
+  '  return y',
+  'endfunc',
+  'func maker n:int func',
+  '  lambda y:int int',
+  '    return + y n',
+  '  endlambda',
+  '  return resultf',
+  'endfunc',
+  'func main void',
+  '  funccall maker 5',
+  '  var func g',
+  '  assign g resultf',
+  '  funccall g 2',
+  '  funccall print resulti',
+  '  funccall helper 1',
+  'endfunc',
+]
+
+MEMOIZED = [
+  'func square x:int int',
+  '  return * x x',
+  'endfunc',
+  'func twice x:int int',
+  '  funccall square x',
+  '  return + resulti resulti',
+  'endfunc',
+  'func main void',
+  '  funccall twice 3',
+  '  funccall print resulti',
+  '  funccall twice 3',
+  '  funccall print resulti',
+  'endfunc',
+]
+
+
+def test_lazy_runs_print_and_fail_like_eager_ones():
+  # Found while compiling helper with static types, while running it without
+  expected = (['7'], (ErrorType.TYPE_ERROR, 2))
+  for static_types in (True, False):
+    assert outcome(PROGRAM, static_types=static_types) == expected
+    assert outcome(PROGRAM, lazy_compile=True, static_types=static_types) == expected
+
+
+def test_syntax_errors_of_lazy_functions_are_raised_on_their_first_call():
+  no_endlambda = [
+    'func broken void',
+    '  lambda x:int int',
+    '    return x',
+    'endfunc',
+    'func main void',
+    '  funccall print "before"',
+    '  funccall broken',
+    'endfunc',
+  ]
+  assert outcome(no_endlambda, lazy_compile=True) == (['before'], (ErrorType.SYNTAX_ERROR, 1))
+  no_endfunc = [
+    'func main void',
+    '  funccall print "before"',
+    '  funccall broken',
+    'endfunc',
+    'func broken void',
+    '  funccall print 1',
+  ]
+  assert outcome(no_endfunc, lazy_compile=True) == (['before'], (ErrorType.SYNTAX_ERROR, 4))
+
+
+def test_functions_never_called_are_never_compiled():
+  program = PROGRAM[:-2] + ['endfunc']
+  interpreter = Interpreter(console_output=False, lazy_compile=True)
+  interpreter.run(program)
+  assert interpreter.get_output() == ['7']
+  assert not interpreter.program.functions.is_compiled('helper')
+
+
+def test_callers_become_memoized_once_their_callees_are_compiled():
+  for lazy_compile in (False, True):
+    interpreter = Interpreter(console_output=False, lazy_compile=lazy_compile, memoize=True)
+    interpreter.run(MEMOIZED)
+    assert interpreter.get_output() == ['18', '18']
+    assert interpreter.get_memo_stats() == {'hits': 1, 'misses': 2, 'size': 2}
+
+
+def test_lazy_programs_are_not_cached(tmp_path):
+  interpreter = Interpreter(console_output=False, lazy_compile=True, cache_dir=str(tmp_path))
+  interpreter.run(MEMOIZED)
+  assert interpreter.get_output() == ['18', '18']
+  assert os.listdir(tmp_path) == []
+  Interpreter(console_output=False, cache_dir=str(tmp_path)).run(MEMOIZED)
+  assert len(os.listdir(tmp_path)) == 1
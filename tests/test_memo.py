@@ -0,0 +1,88 @@
+from intbase import ErrorType
+from memo import MemoCache
+from runs import outcome
+
+
+def test_put_refreshes_a_cached_result():
+  cache = MemoCache(size=2)
+  cache.put(('f', 1), (1, 'int'))
+  cache.put(('f', 2), (2, 'int'))
+  cache.put(('f', 1), (1, 'int'))
+  cache.put(('f', 3), (3, 'int'))
+  assert cache.get(('f', 1)) == (1, 'int')
+  assert cache.get(('f', 2)) is None
+
+
+def test_memoized_runs_print_and_fail_like_unmemoized_ones():
+  program = [
+    'func fib n:int int',
+    '  if < n 2',
+    '    return n',
+    '  endif',
+    '  var int a m',
+    '  assign m - n 1',
+    '  funccall fib m',
+    '  assign a resulti',
+    '  assign m - n 2',
+    '  funccall fib m',
+    '  return + a resulti',
+    'endfunc',
+    'func half n:int int',
+    '  if == % n 2 1',
+    '    return + n "odd"',
+    '  endif',
+    '  return / n 2',
+    'endfunc',
+    'func main void',
+    '  funccall fib 15',
+    '  funccall print resulti',
+    '  funccall fib 15',
+    '  funccall print resulti',
+    '  funccall half 8',
+    '  funccall print resulti',
+    '  funccall half 8',
+    '  funccall print resulti',
+    # Argument errors are raised before the cache is looked up
+    '  funccall half "8"',
+    'endfunc',
+  ]
+  expected = (['610', '610', '4', '4'], (ErrorType.TYPE_ERROR, 27))
+  assert outcome(program) == expected
+  assert outcome(program, memoize=True) == expected
+  odd = program[:-2] + ['  funccall half 3', 'endfunc']
+  assert outcome(odd, memoize=True) == outcome(odd) == (['610', '610', '4', '4'], (ErrorType.TYPE_ERROR, 14))
+
+
+def test_functions_with_effects_are_not_memoized():
+  program = [
+    'func shout n:int int',
+    '  funccall print "shout " n',
+    '  return n',
+    'endfunc',
+    'func calls_shout n:int int',
+    '  funccall shout n',
+    '  return resulti',
+    'endfunc',
+    'func bump x:refint int',
+    '  assign x + x 1',
+    '  return x',
+    'endfunc',
+    'func ask n:int string',
+    '  funccall input',
+    '  return results',
+    'endfunc',
+    'func main void',
+    '  var int i v',
+    '  while < i 2',
+    '    funccall calls_shout 1',
+    '    funccall bump v',
+    '    funccall print resulti',
+    '    funccall ask 1',
+    '    funccall print results',
+    '    assign i + i 1',
+    '  endwhile',
+    'endfunc',
+  ]
+  expected = (['shout 1', '1', '', 'a', 'shout 1', '2', '', 'b'], (None, None))
+  assert outcome(program, input=['a', 'b']) == expected
+  assert outcome(program, input=['a', 'b'], memoize=True) == expected
@@ -0,0 +1,53 @@
+import io
+import sys
+
+from interpreterv3 import Interpreter
+from output import OutputSink
+
+
+class Stdout(io.StringIO):
+  # Standard output counting its writes, a terminal or not
+
+  def __init__(self, terminal):
+    super().__init__()
+    self.terminal = terminal
+    self.writes = 0
+
+  def isatty(self):
+    return self.terminal
+
+  def write(self, text):
+    self.writes += 1
+    return super().write(text)
+
+
+def test_console_output_to_a_terminal_shows_each_line_as_it_is_printed(monkeypatch):
+  stdout = Stdout(terminal=True)
+  monkeypatch.setattr(sys, 'stdout', stdout)
+  interpreter = Interpreter()
+  interpreter.output('prompt')
+  assert stdout.getvalue() == 'prompt\n'
+
+
+def test_console_output_to_a_pipe_is_written_in_blocks(monkeypatch):
+  stdout = Stdout(terminal=False)
+  monkeypatch.setattr(sys, 'stdout', stdout)
+  interpreter = Interpreter()
+  interpreter.run(['func main void', '  var int i', '  while < i 100', '    funccall print i',
+                   '    assign i + i 1', '  endwhile', 'endfunc'])
+  assert stdout.getvalue() == ''.join(f'{i}\n' for i in range(100))
+  assert stdout.writes == 1
+
+
+def test_sinks_buffer_until_full_or_flushed():
+  target = io.StringIO()
+  sink = OutputSink(target, buffer_size=12)
+  sink.write('one')
+  assert target.getvalue() == ''
+  sink.write('two')
+  sink.write('three')
+  assert target.getvalue() == 'one\ntwo\nthree\n'
+  sink.write('four')
+  sink.flush()
+  assert target.getvalue() == 'one\ntwo\nthree\nfour\n'
+  assert sink.get_log() == ['one', 'two', 'three', 'four']
@@ -0,0 +1,102 @@
+import itertools
+
+import pytest
+
+from interpreterv3 import Interpreter
+from profiler import Profiler
+
+PROGRAM = [
+  'func f x:int int',
+  '  return + x 1',
+  'endfunc',
+  'func loop n:int int',
+  '  if == n 0',
+  '    return 0',
+  '  endif',
+  '  var int m',
+  '  assign m - n 1',
+  '  funccall loop m',
+  '  return resulti',
+  'endfunc',
+  'func main void',
+  '  var int i',
+  '  while < i 3',
+  '    funccall f i',
+  '    assign i + i 1',
+  '  endwhile',
+  '  lambda y:int int',
+  '    return * y 2',
+  '  endlambda',
+  '  var func g',
+  '  assign g resultf',
+  '  funccall g 4',
+  '  funccall loop 2',
+  'endfunc',
+]
+
+
+def profiled(program):
+  """Runs a program with a clock going up by a second every time it is read
+
+  Args:
+      program ([string]): The program
+
+  Returns:
+      (Interpreter, Profiler): The interpreter, after the run, and its profiler
+  """
+  ticks = itertools.count()
+  profiler = Profiler(clock=lambda: next(ticks))
+  interpreter = Interpreter(console_output=False, profile=profiler)
+  interpreter.run(program)
+  return interpreter, profiler
+
+
+def test_report_lists_functions_by_inclusive_time_then_lines_by_time():
+  interpreter, profiler = profiled(PROGRAM)
+  rows = profiler.report(limit=3).split('\n')
+  assert [row.split()[0] for row in rows[1:5]] == ['main', 'loop', 'f', 'lambda18']
+  assert rows[5] == ''
+  lines = rows[7:]
+  assert len(lines) == 3
+  assert lines[0].split()[:2] == ['14', '4']
+  assert lines[0].endswith('while < i 3')
+  times = [float(line.split()[2]) for line in lines]
+  assert times == sorted(times, reverse=True)
+
+
+def test_collapsed_stacks_give_self_time_in_microseconds():
+  interpreter, profiler = profiled(PROGRAM)
+  # The lambda runs under main, and the tail calls of loop replace it rather than nest in it
+  assert profiler.collapsed() == ['main 20000000', 'main;f 3000000', 'main;lambda18 1000000', 'main;loop 10000000']
+  assert profiler.functions['loop'][0] == 3
+
+
+def test_calls_not_in_tail_position_nest():
+  program = list(PROGRAM)
+  program[program.index('  return resulti')] = '  return + resulti 0'
+  interpreter, profiler = profiled(program)
+  stacks = [line.split()[0] for line in profiler.collapsed()]
+  assert 'main;loop;loop;loop' in stacks
+  assert profiler.functions['loop'][0] == 3
+
+
+def test_runs_ending_in_an_error_leave_every_function():
+  program = list(PROGRAM)
+  program[program.index('    return 0')] = '    return "zero"'
+  ticks = itertools.count()
+  profiler = Profiler(clock=lambda: next(ticks))
+  interpreter = Interpreter(console_output=False, profile=profiler)
+  with pytest.raises(Exception):
+    interpreter.run(program)
+  assert profiler.stack == []
+  assert all(active == 0 for active in profiler.active.values())
+  assert profiler.functions['main'][2] >= profiler.functions['loop'][2] > 0
+  assert 'loop' in profiler.report()
+
+
+def test_every_run_is_profiled_on_its_own():
+  interpreter, profiler = profiled(PROGRAM)
+  first = {name: function[0] for name, function in profiler.functions.items()}
+  interpreter.run(PROGRAM)
+  assert {name: function[0] for name, function in profiler.functions.items()} == first == \
+    {'main': 1, 'f': 3, 'lambda18': 1, 'loop': 3}
@@ -0,0 +1,64 @@
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+from runs import outcome
+
+# Assigns proven to store the right type, next to ones that fail only when reached
+PROGRAM = [
+  'func label n:int string',
+  '  if > n 1',
+  '    return "many"',
+  '  endif',
+  '  return "one"',
+  'endfunc',
+  'func set x:refint v:int void',
+  '  assign x v',
+  'endfunc',
+  'func main void',
+  '  var int i total',
+  '  var string s',
+  '  var bool b',
+  '  while < i 3',
+  '    assign total + total i',
+  '    if False',
+  '      assign total "never"',
+  '    endif',
+  '    if == i 1',
+  '      var string total',
+  '      assign total "shadow"',
+  '      funccall print total',
+  '    endif',
+  '    assign i + i 1',
+  '  endwhile',
+  '  funccall label total',
+  '  assign s results',
+  '  funccall set total 9',
+  '  assign b == total 9',
+  '  funccall print s " " total " " b',
+  '  lambda y:int int',
+  '    return + y total',
+  '  endlambda',
+  '  var func f',
+  '  assign f resultf',
+  '  funccall f 1',
+  '  assign total resulti',
+  '  funccall print total',
+  '  funccall label 1',
+  '  assign total results',
+  'endfunc',
+]
+
+
+def test_runs_with_static_types_print_and_fail_like_runs_without():
+  expected = (['shadow', 'many 9 True', '10'], (ErrorType.TYPE_ERROR, 39))
+  assert outcome(PROGRAM, static_types=False) == expected
+  assert outcome(PROGRAM) == expected
+
+
+def test_errors_found_ahead_of_time_are_raised_only_when_reached():
+  # The assign on line 16 is never run, the one on line 39 depends on what label returns
+  assert [diagnostic[:2] for diagnostic in Interpreter(console_output=False).check(PROGRAM)] == [(ErrorType.TYPE_ERROR, 16)]
+  reached = list(PROGRAM)
+  reached[15] = '    if True'
+  expected = ([], (ErrorType.TYPE_ERROR, 16))
+  assert outcome(reached, static_types=False) == expected
+  assert outcome(reached) == expected
@@ -0,0 +1,94 @@
+from intbase import ErrorType
+from interpreterv3 import Interpreter
+from runs import outcome
+
+
+def counting_program(tail):
+  # Adding 0 keeps the result the same, but the call is no longer in tail position
+  return [
+    'func count n:int acc:int int',
+    '  if == n 0',
+    '    return acc',
+    '  endif',
+    '  if == n 3',
+    '    funccall print "three " acc',
+    '  endif',
+    '  var int m a',
+    '  assign m - n 1',
+    '  assign a + acc n',
+    '  funccall count m a',
+    '  return resulti' if tail else '  return + resulti 0',
+    'endfunc',
+    'func bad n:int int',
+    '  if == n 0',
+    '    assign n "x"',
+    '  endif',
+    '  var int m',
+    '  assign m - n 1',
+    '  funccall bad m',
+    '  return resulti' if tail else '  return + resulti 0',
+    'endfunc',
+    'func main void',
+    '  funccall count 10 0',
+    '  funccall print resulti',
+    '  funccall bad 5',
+    'endfunc',
+  ]
+
+
+def test_tail_calls_print_and_fail_like_other_calls():
+  expected = (['three 49', '55'], (ErrorType.TYPE_ERROR, 15))
+  assert outcome(counting_program(tail=False)) == expected
+  assert outcome(counting_program(tail=True)) == expected
+
+
+def test_tail_recursion_runs_in_constant_stack():
+  program = counting_program(tail=True)
+  program[program.index('  funccall count 10 0')] = '  funccall count 50000 0'
+  interpreter = Interpreter(console_output=False)
+  try:
+    interpreter.run(program)
+  except Exception:
+    pass
+  assert interpreter.get_output()[1] == str(50000 * 50001 // 2)
+  assert interpreter.get_peak_call_depth() == 2
+
+
+def test_calls_that_cannot_reuse_the_frame_fall_back():
+  program = [
+    'func word x:int string',
+    '  return "w"',
+    'endfunc',
+    'func twice x:int int',
+    '  return * x 2',
+    'endfunc',
+    'func pick f:func x:int int',
+    '  funccall f x',
+    '  return resulti',
+    'endfunc',
+    'func bump x:refint int',
+    '  assign x + x 1',
+    '  return x',
+    'endfunc',
+    'func outer n:int int',
+    '  funccall bump n',
+    '  funccall print "n " n',
+    '  return resulti',
+    'endfunc',
+    'func viaref n:int int',
+    '  funccall bump n',
+    '  return resulti',
+    'endfunc',
+    'func main void',
+    '  funccall pick twice 4',
+    '  funccall print resulti',
+    '  funccall viaref 7',
+    '  funccall print resulti',
+    '  funccall outer 1',
+    '  funccall print resulti',
+    # The function variable returns a string, so resulti was never set
+    '  funccall pick word 4',
+    '  funccall print resulti',
+    'endfunc',
+  ]
+  assert outcome(program) == (['8', '8', 'n 2', '2'], (ErrorType.NAME_ERROR, 8))
@@ -0,0 +1,16 @@
+import io
+
+import pytest
+
+from interpreterv3 import Interpreter
+from tracer import Tracer
+
+
+def test_error_dumps_show_only_the_failing_run():
+  stream = io.StringIO()
+  interpreter = Interpreter(console_output=False, trace_output=Tracer(stream=stream))
+  interpreter.run(['func main void', '  var int first', '  assign first 1', 'endfunc'])
+  with pytest.raises(Exception):
+    interpreter.run(['func main void', '  var string s', '  assign s 1', 'endfunc'])
+  assert [step[0] for step in interpreter.tracer.last_steps()] == [1, 2]
+  assert stream.getvalue().startswith('Last 2 steps')
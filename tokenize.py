@@ -1,9 +1,16 @@
 from intbase import InterpreterBase, ErrorType
+import re
+import sys
 
 
 class Tokenizer:
   # Performs tokenization and returns the tokenized program
 
+  # A token is a run of characters other than spaces, quotes and '#', and of
+  # quoted strings, which may hold spaces and '#' and run to the end of the
+  # line when unterminated. A '#' outside quotes starts a comment.
+  TOKEN = re.compile(r'(?:[^ "#]+|"[^"]*"?)+|#')
+
   def tokenize(self, line):
     """Tokenizes a line into Brewin tokens
 
@@ -13,37 +20,19 @@ class Tokenizer:
     Returns:
         tokenized_line: A toknized statement
     """
-    tokens = [""]
-    inQuotes = False
-    for i in range(len(line)):
-      char = line[i]
-
-      if (char == " " and not inQuotes):
-        if (tokens[-1] == ""):
-          continue
-        else:
-          tokens.append("")
-
+    # Lines without strings are split on spaces, cutting the comment off first
+    if ("\"" not in line):
+      tokens = line.split("#", 1)[0].split(" ")
+      if ("" in tokens):
+        tokens = [token for token in tokens if token]
+    else:
+      tokens = self.TOKEN.findall(line)
       # Comment case
-      elif (char == "#"):
-        if (inQuotes):
-          tokens[-1] = tokens[-1] + char
-        else:
-          break
-
-      # Quotation case
-      elif (char == "\""):
-        tokens[-1] = tokens[-1] + "\""
-        if (not inQuotes):
-          inQuotes = True
-        else:
-          inQuotes = False
-
-      # Normal case
-      else:
-        tokens[-1] = tokens[-1] + char
-
-    # Handling comments now equal to empty string
-    if (len(tokens) > 1 and tokens[-1] == ""):
-      tokens = tokens[:-1]
-    return tokens
\ No newline at end of file
+      if ("#" in tokens):
+        del tokens[tokens.index("#"):]
+
+    # Empty lines and comments are a single empty token
+    if (not tokens):
+      return [""]
+    # Interned tokens make the keyword and name lookups that follow cheaper
+    return list(map(sys.intern, tokens))
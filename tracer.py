@@ -0,0 +1,64 @@
+import sys
+from instruction import Opcode
+
+
+class Tracer:
+  # Keeps the last steps of a run in a ring buffer, written out when the run fails
+
+  # Steps kept by default
+  SIZE = 1024
+
+  # Keyword of each opcode, to show steps as statements
+  NAMES = {opcode: keyword for keyword, opcode in Opcode.KEYWORDS.items()}
+  NAMES.update(Opcode.FUSED_NAMES)
+
+  def __init__(self, size=SIZE, values=False, stream=None):
+    """Creates a tracer
+
+    Args:
+        size (int): Number of most recent steps kept
+        values (bool): Whether to also keep the value each assign stores
+        stream: File the steps are written to on errors, stderr by default
+    """
+    self.size = size
+    self.values = values
+    self.stream = stream
+    # (line, opcode, call depth) of each step, with the value stored when values are kept
+    self.steps = [None] * size
+    # Index the next step is written at, the oldest step once the buffer is full
+    self.position = 0
+
+  def clear(self):
+    # Drops the steps kept, so a run only ever shows its own
+    self.steps = [None] * self.size
+    self.position = 0
+
+  def last_steps(self):
+    """Gives the steps kept, oldest first
+
+    Returns:
+        steps ([tuple]): Line, opcode, call depth and, for assigns when values are kept, the value stored
+    """
+    steps = self.steps[self.position:] + self.steps[:self.position]
+    return [step for step in steps if step is not None]
+
+  def format(self):
+    """Formats the steps kept, oldest first
+
+    Returns:
+        trace (string): A step per line
+    """
+    rows = []
+    for step in self.last_steps():
+      row = f'line {step[0]:5}  depth {step[2]:4}  {self.NAMES.get(step[1], step[1])}'
+      if (len(step) == 4):
+        row += f'  = {step[3]!r}'
+      rows.append(row)
+    return '\n'.join(rows)
+
+  def dump(self):
+    # Writes the steps leading to an error
+    stream = self.stream if self.stream is not None else sys.stderr
+    steps = self.last_steps()
+    stream.write(f'Last {len(steps)} steps, the failing one last:\n{self.format()}\n')
+    stream.flush()
@@ -0,0 +1,119 @@
+import sys
+from intbase import InterpreterBase, ErrorType
+from instruction import Opcode
+from resolver import Address
+
+
+class TypeChecker:
+  # Finds the errors certain to happen when a statement is reached, from the types variables are declared with
+
+  # Types a variable can be declared with
+  TYPES = {InterpreterBase.INT_DEF, InterpreterBase.STRING_DEF, InterpreterBase.BOOL_DEF,
+           InterpreterBase.FUNC_DEF, InterpreterBase.OBJECT_DEF}
+
+  def __init__(self, expressions):
+    """Creates a checker
+
+    Args:
+        expressions (ExpressionCompiler): Infers expression types, errors are added to its diagnostics
+    """
+    self.expressions = expressions
+
+  def report(self, error_type, line_num, description):
+    self.expressions.diagnostics.append((error_type, line_num, description))
+
+  def variable_type(self, name, scope):
+    """Finds the type a variable is known to hold before running
+
+    Args:
+        name (string): A variable name
+        scope (BlockScope): Names in scope
+
+    Returns:
+        value_type (string): The declared type, None for results, members and names bound at run time
+    """
+    address = scope.resolve(name)
+    if (address.kind != Address.LOCAL and address.kind != Address.REFERENCE):
+      return None
+    return scope.type_of(name)
+
+  def check(self, opcode, statement, line_num, scope, functions, function):
+    """Checks the types of a statement, reporting the errors it is certain to raise
+
+    Args:
+        opcode (int): Opcode of the statement
+        statement ([string]): A tokenized statement
+        line_num (int): Source line of the statement
+        scope (BlockScope): Names in scope at the statement
+        functions (FunctionManager): Function definitions of the program
+        function (FunctionDescriptor): The function holding the statement
+    """
+    infer = self.expressions.infer
+    match opcode:
+      case Opcode.VAR:
+        if (len(statement) > 1 and statement[1] not in self.TYPES):
+          self.report(ErrorType.TYPE_ERROR, line_num, "Variable type is wrong")
+
+      case Opcode.ASSIGN:
+        if (len(statement) < 3 or '.' in statement[1]):
+          return
+        variable_type = self.variable_type(statement[1], scope)
+        value_type = infer(statement[2:], scope)
+        if (variable_type is not None and value_type is not None and variable_type != value_type):
+          self.report(ErrorType.TYPE_ERROR, line_num, "Variable type is different than value assigned")
+
+      case Opcode.IF | Opcode.WHILE:
+        value_type = infer(statement[1:], scope)
+        if (value_type is not None and value_type != InterpreterBase.BOOL_DEF):
+          self.report(ErrorType.TYPE_ERROR, line_num, "Expression result is not a bool")
+
+      case Opcode.RETURN:
+        if (len(statement) < 2):
+          return
+        value_type = infer(statement[1:], scope)
+        # Returning from main only fails for values returned from a void main
+        if (function.name == InterpreterBase.MAIN_FUNC):
+          wrong = function.return_type == InterpreterBase.VOID_DEF
+        else:
+          wrong = value_type is not None and value_type != function.return_type
+        if (wrong):
+          self.report(ErrorType.TYPE_ERROR, line_num, "Wrong return type")
+
+      case Opcode.FUNCCALL:
+        if (len(statement) < 2):
+          return
+        function_name = statement[1]
+        arguments = [self.expressions.static_type(self.expressions.parse_operand(token, scope))
+                     for token in statement[2:]]
+        if (function_name == InterpreterBase.STRTOINT_DEF):
+          if (arguments and arguments[0] is not None and arguments[0] != InterpreterBase.STRING_DEF):
+            self.report(ErrorType.TYPE_ERROR, line_num, "Passed value is not a string")
+        elif (function_name not in (InterpreterBase.PRINT_DEF, InterpreterBase.INPUT_DEF) and
+              functions.function_present(function_name)):
+          parameters = functions.get_parameters(function_name)
+          if (len(arguments) != len(parameters)):
+            self.report(ErrorType.NAME_ERROR, line_num, "Wrong number of parameters")
+            return
+          for argument, parameter in zip(arguments, parameters):
+            if (argument is not None and argument != parameter[1]):
+              self.report(ErrorType.TYPE_ERROR, line_num, "Wrong type of Parameters")
+              return
+
+
+def main():
+  import argparse
+  # Imported here, the interpreter imports this module
+  from interpreterv3 import Interpreter
+
+  parser = argparse.ArgumentParser(description='Reports the errors a Brewin program is certain to raise, without running it')
+  parser.add_argument('program', help='path of the program')
+  arguments = parser.parse_args()
+
+  diagnostics = Interpreter().check(arguments.program)
+  for error_type, line_num, description in diagnostics:
+    print(f'{arguments.program}:{line_num}: {error_type}: {description}')
+  sys.exit(1 if diagnostics else 0)
+
+
+if __name__ == '__main__':
+  main()